@@ -1,9 +1,6 @@
 from flask import Flask, request, jsonify
 import pandas as pd
 from jobspy import scrape_jobs
-import time
-import random
-import requests
 import json
 import os
 import re
@@ -13,7 +10,21 @@ import logging
 from logging.handlers import RotatingFileHandler
 import threading
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from collections import defaultdict
+import sys
+
+# Shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream import zoho_crm, zoho_domain, apollo, is_throttled, retry_after, UpstreamError, UpstreamThrottled
+from rate_limit import RateLimitExceeded
+from zoho_auth import ZohoTokenManager
+from zoho_records import MAX_RECORDS_PER_CALL, chunked, find_existing, insert_records, upsert_records
+from scrape_prep import prepare_frame, to_records
+from pipeline import Pipeline
+from company_index import normalize_company_name
+from enrichment_cursors import decode_cursor, encode_cursor
 
 app = Flask(__name__)
 
@@ -34,133 +45,257 @@ ZOHO_CLIENT_SECRET = os.environ.get('ZOHO_CLIENT_SECRET', '')
 ZOHO_REFRESH_TOKEN = os.environ.get('ZOHO_REFRESH_TOKEN', '')
 API_KEY = os.environ.get('API_KEY', 'your-secure-api-key-here')
 
+# Only /tmp is writable on Vercel
+zoho_tokens = ZohoTokenManager(
+    ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_REFRESH_TOKEN,
+    cache_path=os.environ.get('ZOHO_TOKEN_CACHE', '/tmp/zoho_token.json')
+)
+# Zoho CRM calls whose token is rejected get a fresh one and are retried once
+zoho_crm.auth = zoho_tokens
+
 app.logger.info(f'API_KEY configured: {API_KEY[:10]}...' if API_KEY else 'No API_KEY')
 
 # Zoho configuration
-ZOHO_DOMAIN = "https://www.zohoapis.com"
 COMPANY_MODULE = "Accounts"
 JOBS_MODULE = "Jobs"
+JUNCTION_MODULE = "Account_X_Job"
 COMPANY_RELATION_FIELD = "Related_company"
 
+# "upsert" lets Zoho dedupe jobs on ID_Indeed and contacts on Email in the
+# write itself; "insert" keeps the search-then-insert behaviour
+ZOHO_WRITE_MODE = os.environ.get('ZOHO_WRITE_MODE', 'upsert')
+
+# Bulk contact enrichment searches Apollo once per website domain. Companies
+# sharing a domain get its contacts by this rule: "first" gives them all to
+# the first company, "split" deals them out in turn, "all" copies them to each.
+# Companies left without any are not marked in Apollo_Contact, which means
+# Apollo has no contacts for them; a later run skips the people they would
+# get again as duplicates
+DOMAIN_ASSIGNMENTS = ('first', 'split', 'all')
+ENRICH_DOMAIN_ASSIGNMENT = os.environ.get('ENRICH_DOMAIN_ASSIGNMENT', 'first')
+
+# Domains enriched at the same time by the bulk endpoints; the shared rate
+# limiters keep the workers within the Apollo and Zoho quotas
+ENRICH_WORKERS = max(1, int(os.environ.get('ENRICH_WORKERS', 4)))
+
+# Companies of a scrape searched in Zoho at the same time, before its jobs are written
+COMPANY_RESOLVE_WORKERS = max(1, int(os.environ.get('COMPANY_RESOLVE_WORKERS', 4)))
+
+# Scrape pipeline (see pipeline.py): jobs per chunk handed between stages, and
+# chunks written to Zoho at the same time
+PIPELINE_CHUNK_SIZE = max(1, int(os.environ.get('PIPELINE_CHUNK_SIZE', MAX_RECORDS_PER_CALL)))
+PIPELINE_WRITE_WORKERS = max(1, int(os.environ.get('PIPELINE_WRITE_WORKERS', 2)))
+
+# Multi-query scrapes: scrape_jobs calls run at the same time, and the most
+# queries one request may list
+SCRAPE_QUERY_WORKERS = max(1, int(os.environ.get('SCRAPE_QUERY_WORKERS', 4)))
+SCRAPE_MAX_QUERIES = int(os.environ.get('SCRAPE_MAX_QUERIES', 50))
+
 # Import all functions from the original app.py
 # (We'll copy all the helper functions here)
 
+def lotes_de_trabajos(jobs, tamano=None):
+    """Split a scrape_jobs DataFrame into chunks for procesar_scraping_en_etapas."""
+    tamano = tamano or PIPELINE_CHUNK_SIZE
+    for inicio in range(0, len(jobs), tamano):
+        yield jobs.iloc[inicio:inicio + tamano]
+
+def consultas_de_scraping(data):
+    """The scrape_jobs calls a /scrape payload asks for.
+    
+    "queries" lists search_term/location/results_wanted/hours_old/country
+    combinations; what a query leaves out comes from the top level of the
+    payload, then the defaults. Without "queries" the payload itself is the
+    only query. Raises ValueError for a malformed list.
+    """
+    base = {
+        'search_term': data.get('search_term', 'Call Center'),
+        'location': data.get('location', ''),
+        'results_wanted': data.get('results_wanted', 50),
+        'hours_old': data.get('hours_old', 1440),
+        'country': data.get('country', 'USA')
+    }
+    queries = data.get('queries') or [{}]
+    if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+        raise ValueError('queries must be a list of objects')
+    if len(queries) > SCRAPE_MAX_QUERIES:
+        raise ValueError(f"At most {SCRAPE_MAX_QUERIES} queries per request")
+    
+    consultas = []
+    for query in queries:
+        consulta = dict(base, **{campo: query[campo] for campo in base if campo in query})
+        try:
+            consulta['results_wanted'] = int(consulta['results_wanted'])
+            consulta['hours_old'] = int(consulta['hours_old'])
+        except (TypeError, ValueError):
+            raise ValueError('results_wanted and hours_old must be integers')
+        consultas.append(consulta)
+    return consultas
+
+def ejecutar_consulta_scraping(consulta):
+    """Scrape jobs from Indeed for one query."""
+    return scrape_jobs(
+        site_name=["indeed"],
+        search_term=consulta['search_term'],
+        location=consulta['location'],
+        results_wanted=consulta['results_wanted'],
+        hours_old=consulta['hours_old'],
+        country_indeed=consulta['country'],
+    )
+
+def lotes_de_consultas(consultas, informe, al_terminar=None):
+    """Run the queries SCRAPE_QUERY_WORKERS at a time, yielding their jobs in chunks.
+    
+    Each query's jobs are yielded as soon as it finishes, so the Zoho stages
+    start on the fastest query while the others are still scraping. informe
+    gets one entry per query, in query order, with its jobs_found or error.
+    al_terminar(jobs) runs for every query that finishes. A failed query
+    does not stop the others; if every query fails, the first error is raised.
+    """
+    informe[:] = [{'search_term': c['search_term'], 'location': c['location']} for c in consultas]
+    pool = ThreadPoolExecutor(
+        max_workers=min(SCRAPE_QUERY_WORKERS, len(consultas)), thread_name_prefix='scrape-query'
+    )
+    try:
+        futuros = {pool.submit(ejecutar_consulta_scraping, consulta): i for i, consulta in enumerate(consultas)}
+        errores = []
+        for futuro in as_completed(futuros):
+            entrada = informe[futuros[futuro]]
+            try:
+                jobs = futuro.result()
+            except Exception as e:
+                app.logger.error(f"Scrape of '{entrada['search_term']}' in '{entrada['location']}' failed: {e}")
+                entrada['error'] = str(e)
+                errores.append(e)
+                continue
+            entrada['jobs_found'] = len(jobs)
+            if al_terminar:
+                al_terminar(jobs)
+            yield from lotes_de_trabajos(jobs)
+        if len(errores) == len(consultas):
+            raise errores[0]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def procesar_scraping_en_etapas(lotes, progreso=None):
+    """Write scraped jobs to Zoho through a staged pipeline.
+    
+    lotes yields scrape_jobs DataFrames, e.g. from lotes_de_consultas; each one
+    goes through these stages, joined by bounded queues:
+    
+    - prepare: clean the columns (see scrape_prep.py) and drop Indeed IDs
+      already seen in this scrape, whichever query found them first;
+    - resolve: find or create the companies not resolved yet, one chunk at a
+      time so no company is created twice;
+    - write: batched Zoho writes, PIPELINE_WRITE_WORKERS chunks at a time.
+    
+    progreso(procesados, creados, omitidos) runs after every chunk written.
+    Stages take the Zoho token per chunk, so a scrape that outlives one
+    token carries on with the next. Returns the scrape summary.
+    """
+    summary = {
+        'total_jobs_found': 0,
+        'jobs_created': 0,
+        'jobs_skipped': 0,
+        'jobs_updated': 0,
+        'existing_companies_used': 0,
+        'new_companies_created': 0
+    }
+    procesados = {'count': 0}
+    lock = threading.Lock()
+    vistos = set()
+    cache_empresas = {}
+    sin_cuenta = set()
+    
+    def preparar(lote):
+        frame = prepare_frame(lote)
+        nuevos = ~frame['id'].isin(vistos) & ~frame['id'].duplicated()
+        vistos.update(frame['id'])
+        repetidos = len(frame) - int(nuevos.sum())
+        with lock:
+            summary['total_jobs_found'] += len(frame)
+            summary['jobs_skipped'] += repetidos
+            procesados['count'] += repetidos
+        frame = frame[nuevos]
+        return frame if len(frame) else None
+    
+    def resolver(frame):
+        # Companies seen in an earlier chunk, under any spelling, are already
+        # resolved or failed to be created
+        claves = [normalize_company_name(nombre) for nombre in frame['company']]
+        empresas = {}
+        for nombre, website, clave in zip(frame['company'], frame['company_url_direct'], claves):
+            if clave not in cache_empresas and clave not in sin_cuenta:
+                empresas.setdefault(nombre, website)
+        if empresas:
+            ids, existentes, creadas = resolver_empresas(get_access_token(), empresas)
+            cache_empresas.update((normalize_company_name(nombre), company_id) for nombre, company_id in ids.items())
+            sin_cuenta.update(normalize_company_name(nombre) for nombre in empresas if nombre not in ids)
+            with lock:
+                summary['existing_companies_used'] += existentes
+                summary['new_companies_created'] += creadas
+        trabajos = [
+            (trabajo, cache_empresas[clave])
+            for trabajo, clave in zip(to_records(frame), claves)
+            if clave in cache_empresas
+        ]
+        return trabajos or None
+    
+    def escribir(trabajos):
+        resultados = crear_trabajos_en_zoho_lote(get_access_token(), trabajos)
+        creados = sum(1 for r in resultados if r['status'] == 'created')
+        with lock:
+            summary['jobs_created'] += creados
+            summary['jobs_updated'] += sum(1 for r in resultados if r['status'] == 'updated')
+            summary['jobs_skipped'] += len(resultados) - creados
+            procesados['count'] += len(resultados)
+            if progreso:
+                progreso(procesados['count'], summary['jobs_created'], summary['jobs_skipped'])
+    
+    pipeline = Pipeline('scrape')
+    pipeline.stage('prepare', preparar)
+    pipeline.stage('resolve', resolver)
+    pipeline.stage('write', escribir, workers=PIPELINE_WRITE_WORKERS)
+    pipeline.run(lotes)
+    return summary
+
 # Función para procesar jobs en background
-def process_scraping_job(job_id, data, access_token):
+def process_scraping_job(job_id, data):
     """Procesa el scraping en un thread separado"""
     try:
         # Actualizar estado
         job_status[job_id]['status'] = 'processing'
         job_status[job_id]['start_time'] = datetime.now().isoformat()
         
-        # Extraer parámetros
-        search_term = data.get('search_term', 'Call Center')
-        location = data.get('location', '')
-        results_wanted = int(data.get('results_wanted', 50))
-        hours_old = int(data.get('hours_old', 1440))
-        country = data.get('country', 'USA')
-        
-        app.logger.info(f"Job {job_id}: Starting background scraping")
-        
-        # Scrape jobs from Indeed
-        jobs = scrape_jobs(
-            site_name=["indeed"],
-            search_term=search_term,
-            location=location,
-            results_wanted=results_wanted,
-            hours_old=hours_old,
-            country_indeed=country,
-        )
-        
-        app.logger.info(f"Job {job_id}: Found {len(jobs)} jobs")
+        # Queries to scrape; a payload without "queries" is a single query
+        consultas = consultas_de_scraping(data)
         
-        # Filter columns
-        columnas_deseadas = ['id', 'title', 'company', 'location', 'job_url', 'job_url_direct', 
-                           'company_url', 'company_url_direct', 'date_posted', 'description']
+        app.logger.info(f"Job {job_id}: Starting background scraping ({len(consultas)} queries)")
         
-        for col in columnas_deseadas:
-            if col not in jobs.columns:
-                jobs[col] = None
-        
-        jobs_filtrados = jobs[columnas_deseadas].copy()
-        jobs_filtrados = jobs_filtrados.fillna('')
+        informe = []
+        job_status[job_id]['total_jobs'] = 0
+        job_status[job_id]['processed_jobs'] = 0
         
-        # Process statistics
-        contador_insertados = 0
-        contador_omitidos = 0
-        contador_empresas_existentes = 0
-        contador_empresas_nuevas = 0
+        def al_terminar(jobs):
+            app.logger.info(f"Job {job_id}: Found {len(jobs)} jobs")
+            job_status[job_id]['total_jobs'] += len(jobs)
         
-        # Company cache
-        cache_empresas = {}
+        def actualizar_progreso(procesados, creados, omitidos):
+            job_status[job_id]['processed_jobs'] = procesados
+            job_status[job_id]['jobs_created'] = creados
+            job_status[job_id]['jobs_skipped'] = omitidos
         
-        # Actualizar progreso
-        total_jobs = len(jobs_filtrados)
-        job_status[job_id]['total_jobs'] = total_jobs
-        job_status[job_id]['processed_jobs'] = 0
-        
-        # Process each job
-        for index, row in jobs_filtrados.iterrows():
-            try:
-                company_name = row['company'].strip()
-                company_website = row['company_url_direct'].strip()
-                
-                if not company_name:
-                    company_name = "Unknown Company"
-                
-                if not company_website:
-                    company_website = ""
-                
-                # Check company cache
-                if company_name in cache_empresas:
-                    company_id = cache_empresas[company_name]
-                else:
-                    # Search for company in Zoho
-                    company_id = buscar_empresa_en_zoho(access_token, company_name)
-                    
-                    # Create if not exists
-                    if not company_id:
-                        try:
-                            company_id = crear_empresa_en_zoho(access_token, company_name, company_website)
-                            contador_empresas_nuevas += 1
-                        except Exception as e:
-                            app.logger.error(f"Job {job_id}: Error creating company '{company_name}': {e}")
-                            continue
-                    else:
-                        contador_empresas_existentes += 1
-                    
-                    # Save to cache
-                    cache_empresas[company_name] = company_id
-                
-                # Create job in Zoho
-                job_data_dict = row.to_dict()
-                
-                if crear_trabajo_en_zoho(access_token, job_data_dict, company_id):
-                    contador_insertados += 1
-                else:
-                    contador_omitidos += 1
-                
-                # Actualizar progreso
-                job_status[job_id]['processed_jobs'] = index + 1
-                job_status[job_id]['jobs_created'] = contador_insertados
-                job_status[job_id]['jobs_skipped'] = contador_omitidos
-                
-                # Rate limiting
-                time.sleep(random.uniform(0.5, 1.5))
-                
-            except Exception as e:
-                app.logger.error(f"Job {job_id}: Error processing job: {e}")
+        # Queries scraped in parallel; each one's jobs are prepared, matched to
+        # companies and written to Zoho by the pipeline stages as soon as it finishes
+        summary = procesar_scraping_en_etapas(
+            lotes_de_consultas(consultas, informe, al_terminar), actualizar_progreso
+        )
+        summary['queries'] = informe
         
         # Actualizar resultado final
         job_status[job_id]['status'] = 'completed'
         job_status[job_id]['end_time'] = datetime.now().isoformat()
-        job_status[job_id]['summary'] = {
-            'total_jobs_found': len(jobs_filtrados),
-            'jobs_created': contador_insertados,
-            'jobs_skipped': contador_omitidos,
-            'existing_companies_used': contador_empresas_existentes,
-            'new_companies_created': contador_empresas_nuevas
-        }
+        job_status[job_id]['summary'] = summary
         
         app.logger.info(f"Job {job_id}: Completed - {job_status[job_id]['summary']}")
         
@@ -221,6 +356,19 @@ def ensure_serializable(data):
     else:
         return str(data)
 
+def respuesta_limite_apollo(e, **extra):
+    """429 response for a call refused by Apollo's rate limits."""
+    retry = int(e.wait) + 1
+    response = jsonify(dict({
+        'success': False,
+        'throttled': True,
+        'error': str(e),
+        'retry_after': retry,
+        'timestamp': datetime.now().isoformat()
+    }, **extra))
+    response.headers['Retry-After'] = str(retry)
+    return response, 429
+
 def obtener_dominio_desde_url(url):
     """Extract base domain from URL."""
     if not url or not isinstance(url, str):
@@ -262,7 +410,7 @@ def enriquecer_empresa_apollo(dominio):
     payload = {"domain": dominio}
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = apollo.post(url, headers=headers, json=payload)
         
         if response.status_code == 200:
             data = response.json()
@@ -297,33 +445,16 @@ def enriquecer_empresa_apollo(dominio):
         return None
 
 def get_access_token():
-    """Get access token using refresh token."""
-    url = f"https://accounts.zoho.com/oauth/v2/token"
-    data = {
-        'refresh_token': ZOHO_REFRESH_TOKEN,
-        'client_id': ZOHO_CLIENT_ID,
-        'client_secret': ZOHO_CLIENT_SECRET,
-        'grant_type': 'refresh_token'
-    }
-    
-    app.logger.info("Requesting Zoho access token")
-    response = requests.post(url, data=data)
-    
-    if response.status_code == 200:
-        app.logger.info("Access token obtained successfully")
-        return response.json()['access_token']
-    else:
-        error_msg = f"Error getting token: Code {response.status_code}, Response: {response.text}"
-        app.logger.error(error_msg)
-        raise Exception(error_msg)
+    """Get access token using refresh token (cached until shortly before expiry)."""
+    return zoho_tokens.get_token()
 
 def verificar_id_empresa(access_token, company_id):
     """Verify that company ID is valid in Accounts module."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/{COMPANY_MODULE}/{company_id}"
+    url = f"{zoho_domain()}/crm/v2/{COMPANY_MODULE}/{company_id}"
     headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
     
     try:
-        response = requests.get(url, headers=headers)
+        response = zoho_crm.get(url, headers=headers)
         if response.status_code == 200:
             app.logger.info(f"Company ID {company_id} verified successfully")
             return True
@@ -336,7 +467,7 @@ def verificar_id_empresa(access_token, company_id):
 
 def buscar_empresa_en_zoho(access_token, company_name):
     """Search for company by name in Zoho CRM Accounts module."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/{COMPANY_MODULE}/search"
+    url = f"{zoho_domain()}/crm/v2/{COMPANY_MODULE}/search"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
@@ -345,7 +476,7 @@ def buscar_empresa_en_zoho(access_token, company_name):
     query_params = {'criteria': f"Account_Name:equals:{company_name}"}
     
     try:
-        response = requests.get(url, headers=headers, params=query_params)
+        response = zoho_crm.get(url, headers=headers, params=query_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -356,7 +487,7 @@ def buscar_empresa_en_zoho(access_token, company_name):
         
         # Try with contains if exact match fails
         query_params = {'criteria': f"Account_Name:contains:{company_name}"}
-        response = requests.get(url, headers=headers, params=query_params)
+        response = zoho_crm.get(url, headers=headers, params=query_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -374,7 +505,7 @@ def buscar_empresa_en_zoho(access_token, company_name):
 
 def crear_empresa_en_zoho(access_token, company_name, company_website):
     """Create new company in Zoho CRM Accounts module and enrich with Apollo."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/{COMPANY_MODULE}"
+    url = f"{zoho_domain()}/crm/v2/{COMPANY_MODULE}"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
@@ -419,7 +550,7 @@ def crear_empresa_en_zoho(access_token, company_name, company_website):
                 data["data"][0]["Data_Source"] = "Indeed + Apollo.io"
     
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = zoho_crm.post(url, headers=headers, json=data)
         
         if response.status_code == 201:
             result = response.json()
@@ -435,9 +566,50 @@ def crear_empresa_en_zoho(access_token, company_name, company_website):
         app.logger.error(f"Error creating company: {e}")
         raise
 
+def resolver_empresa(access_token, company_name, company_website):
+    """Account ID of a company, creating it if Zoho does not have it; returns (id, created)."""
+    company_id = buscar_empresa_en_zoho(access_token, company_name)
+    if company_id:
+        return company_id, False
+    return crear_empresa_en_zoho(access_token, company_name, company_website), True
+
+def resolver_empresas(access_token, empresas):
+    """Find or create the Account of every company a scrape found.
+    
+    empresas maps company name -> website; companies are resolved
+    COMPANY_RESOLVE_WORKERS at a time. Names differing only in case or
+    spacing are resolved once, under the first spelling given, so they never
+    create two Accounts. Returns ({company name: Account ID} with every
+    spelling, number found, number created); companies that could not be
+    created are logged and left out.
+    """
+    variantes = {}
+    for nombre in empresas:
+        variantes.setdefault(normalize_company_name(nombre), []).append(nombre)
+    
+    ids = {}
+    existentes = nuevas = 0
+    with ThreadPoolExecutor(max_workers=COMPANY_RESOLVE_WORKERS, thread_name_prefix='resolve-company') as pool:
+        futuros = {
+            pool.submit(resolver_empresa, access_token, nombres[0], empresas[nombres[0]]): nombres
+            for nombres in variantes.values()
+        }
+        for futuro, nombres in futuros.items():
+            try:
+                company_id, creada = futuro.result()
+            except Exception as e:
+                app.logger.error(f"Error creating company '{nombres[0]}': {e}")
+                continue
+            ids.update((nombre, company_id) for nombre in nombres)
+            if creada:
+                nuevas += 1
+            else:
+                existentes += 1
+    return ids, existentes, nuevas
+
 def buscar_trabajo_en_zoho(access_token, indeed_id):
     """Check if job with Indeed ID already exists in Zoho."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/{JOBS_MODULE}/search"
+    url = f"{zoho_domain()}/crm/v2/{JOBS_MODULE}/search"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
@@ -446,7 +618,7 @@ def buscar_trabajo_en_zoho(access_token, indeed_id):
     query_params = {'criteria': f"ID_Indeed:equals:{indeed_id}"}
     
     try:
-        response = requests.get(url, headers=headers, params=query_params)
+        response = zoho_crm.get(url, headers=headers, params=query_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -457,6 +629,82 @@ def buscar_trabajo_en_zoho(access_token, indeed_id):
     
     return False
 
+def construir_registro_trabajo(job_data, company_id):
+    """Build the Zoho Jobs record for a scraped job."""
+    record = {
+        "Name": job_data['title'],
+        "ID_Indeed": job_data['id'],
+        "Location": job_data['location'],
+        "Company_URL": job_data['company_url_direct'],
+        # Establecer la relación con la empresa de múltiples formas
+        "Account": company_id,  # Campo principal de relación
+        "Related_company": {    # Campo adicional de relación
+            "id": company_id
+        },
+        "Lookup_1": {          # Campo Lookup_1 con ID de empresa
+            "id": company_id
+        }
+    }
+    
+    # Add optional fields
+    if 'job_url' in job_data and job_data['job_url']:
+        record["Job_URL"] = job_data['job_url']
+    
+    if 'job_url_direct' in job_data and job_data['job_url_direct']:
+        record["Job_URL_Direct"] = job_data['job_url_direct']
+    
+    if 'company' in job_data and job_data['company']:
+        record["Company"] = job_data['company']
+    
+    if 'company_url' in job_data and job_data['company_url']:
+        record["Company_URL_Indeed"] = job_data['company_url']
+    
+    if 'description' in job_data and job_data['description']:
+        description = job_data['description']
+        if len(description) > 1000:
+            description = description[:997] + "..."
+        record["Description"] = description
+    
+    record["Date_Found"] = datetime.now().strftime("%Y-%m-%d")
+    
+    # Ensure data is serializable
+    return ensure_serializable(record)
+
+def crear_registro_junction(access_token, job_id, company_id):
+    """Link a job to its company in the Account_X_Job junction module."""
+    headers = {
+        'Authorization': f'Zoho-oauthtoken {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    try:
+        junction_url = f"{zoho_domain()}/crm/v2/{JUNCTION_MODULE}"
+        junction_data = {
+            "data": [{
+                "Related_Job": {"id": job_id},
+                "Related_company": {"id": company_id}
+            }]
+        }
+        
+        app.logger.info(f"Creating junction record with data: {junction_data}")
+        junction_response = zoho_crm.post(junction_url, headers=headers, json=junction_data)
+        
+        if junction_response.status_code == 201:
+            app.logger.info("✅ Junction record created successfully in Account_X_Job")
+            return True
+        else:
+            app.logger.warning(f"Failed to create junction record: {junction_response.status_code}")
+            if junction_response.status_code == 202:
+                try:
+                    error_details = junction_response.json()
+                    app.logger.error(f"Junction error details: {error_details}")
+                except:
+                    pass
+    except Exception as e:
+        app.logger.warning(f"Error creating junction record: {e}")
+    
+    return False
+
 def crear_trabajo_en_zoho(access_token, job_data, company_id):
     """Create new job in Zoho CRM Jobs module."""
     # Check if job already exists
@@ -465,9 +713,7 @@ def crear_trabajo_en_zoho(access_token, job_data, company_id):
         app.logger.info(f"Job with Indeed ID '{indeed_id}' already exists. Skipping.")
         return False
     
-    JUNCTION_MODULE = "Account_X_Job"
-    
-    jobs_url = f"{ZOHO_DOMAIN}/crm/v2/{JOBS_MODULE}"
+    jobs_url = f"{zoho_domain()}/crm/v2/{JOBS_MODULE}"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
@@ -478,53 +724,13 @@ def crear_trabajo_en_zoho(access_token, job_data, company_id):
         app.logger.error(f"Company ID {company_id} is not valid")
         return False
     
-    # Create job data
-    job_data_dict = {
-        "data": [{
-            "Name": job_data['title'],
-            "ID_Indeed": indeed_id,
-            "Location": job_data['location'],
-            "Company_URL": job_data['company_url_direct'],
-            # Establecer la relación con la empresa de múltiples formas
-            "Account": company_id,  # Campo principal de relación
-            "Related_company": {    # Campo adicional de relación
-                "id": company_id
-            },
-            "Lookup_1": {          # Campo Lookup_1 con ID de empresa
-                "id": company_id
-            }
-        }]
-    }
-    
     app.logger.info(f"Creating job with company relationship - Company ID: {company_id}")
     
-    # Add optional fields
-    if 'job_url' in job_data and job_data['job_url']:
-        job_data_dict["data"][0]["Job_URL"] = job_data['job_url']
-    
-    if 'job_url_direct' in job_data and job_data['job_url_direct']:
-        job_data_dict["data"][0]["Job_URL_Direct"] = job_data['job_url_direct']
-    
-    if 'company' in job_data and job_data['company']:
-        job_data_dict["data"][0]["Company"] = job_data['company']
-    
-    if 'company_url' in job_data and job_data['company_url']:
-        job_data_dict["data"][0]["Company_URL_Indeed"] = job_data['company_url']
-    
-    if 'description' in job_data and job_data['description']:
-        description = job_data['description']
-        if len(description) > 1000:
-            description = description[:997] + "..."
-        job_data_dict["data"][0]["Description"] = description
-    
-    job_data_dict["data"][0]["Date_Found"] = datetime.now().strftime("%Y-%m-%d")
-    
-    # Ensure data is serializable
-    safe_data = ensure_serializable(job_data_dict)
+    safe_data = {"data": [construir_registro_trabajo(job_data, company_id)]}
     
     try:
         # Create job
-        job_response = requests.post(jobs_url, headers=headers, json=safe_data)
+        job_response = zoho_crm.post(jobs_url, headers=headers, json=safe_data)
         
         if job_response.status_code != 201:
             app.logger.error(f"Error creating job: {job_response.status_code} - {job_response.text}")
@@ -537,7 +743,7 @@ def crear_trabajo_en_zoho(access_token, job_data, company_id):
                 }]
             }
             
-            minimal_response = requests.post(jobs_url, headers=headers, json=minimal_data)
+            minimal_response = zoho_crm.post(jobs_url, headers=headers, json=minimal_data)
             if minimal_response.status_code != 201:
                 app.logger.error(f"Also failed with minimal data: {minimal_response.text}")
                 return False
@@ -548,39 +754,170 @@ def crear_trabajo_en_zoho(access_token, job_data, company_id):
         app.logger.info(f"Job created with ID: {job_id}")
         
         # Try to create junction record with correct field names
-        try:
-            junction_url = f"{ZOHO_DOMAIN}/crm/v2/{JUNCTION_MODULE}"
-            junction_data = {
-                "data": [{
-                    "Related_Job": {"id": job_id},
-                    "Related_company": {"id": company_id}
-                }]
-            }
-            
-            app.logger.info(f"Creating junction record with data: {junction_data}")
-            junction_response = requests.post(junction_url, headers=headers, json=junction_data)
-            
-            if junction_response.status_code == 201:
-                app.logger.info("✅ Junction record created successfully in Account_X_Job")
-            else:
-                app.logger.warning(f"Failed to create junction record: {junction_response.status_code}")
-                if junction_response.status_code == 202:
-                    try:
-                        error_details = junction_response.json()
-                        app.logger.error(f"Junction error details: {error_details}")
-                    except:
-                        pass
-        except Exception as e:
-            app.logger.warning(f"Error creating junction record: {e}")
+        crear_registro_junction(access_token, job_id, company_id)
         
         return True
     except Exception as e:
         app.logger.error(f"Error creating job: {e}")
         return False
 
+def crear_registros_junction_lote(access_token, enlaces, max_reintentos=2):
+    """
+    Create Account_X_Job junction records in batches of up to 100.
+    
+    Args:
+        enlaces: list of (job_id, company_id) tuples
+        max_reintentos: follow-up batches for links Zoho rejected
+    
+    Returns the list of (job_id, company_id) links that could not be created.
+    """
+    pendientes = list(enlaces)
+    
+    for intento in range(max_reintentos + 1):
+        if not pendientes:
+            break
+        if intento > 0:
+            app.logger.warning(f"Retrying {len(pendientes)} failed junction records (attempt {intento + 1})")
+        
+        registros = [{
+            "Related_Job": {"id": job_id},
+            "Related_company": {"id": company_id}
+        } for job_id, company_id in pendientes]
+        respuestas = insert_records(access_token, JUNCTION_MODULE, registros)
+        
+        fallidos = []
+        for enlace, respuesta in zip(pendientes, respuestas):
+            if not respuesta['success']:
+                app.logger.error(f"Junction error for job {enlace[0]}: {respuesta['code']} - {respuesta['message']}")
+                fallidos.append(enlace)
+        
+        app.logger.info(f"✅ {len(pendientes) - len(fallidos)} junction records created in Account_X_Job")
+        pendientes = fallidos
+    
+    if pendientes:
+        app.logger.error(f"Could not create {len(pendientes)} junction records after {max_reintentos} retries")
+    
+    return pendientes
+
+def crear_trabajos_en_zoho_lote(access_token, trabajos, progreso=None, modo=None):
+    """
+    Create jobs in Zoho CRM in batches of up to 100 records per call.
+    
+    Args:
+        trabajos: list of (job_data, company_id) tuples
+        progreso: optional callback(processed, created, skipped) run after each batch
+        modo: "upsert" (dedupe on ID_Indeed server-side) or "insert";
+              defaults to ZOHO_WRITE_MODE
+    
+    Jobs already in Zoho are skipped, never rewritten: an upsert would
+    re-stamp their Date_Found and move their Account link. They are looked
+    up 50 Indeed IDs per COQL query.
+    
+    Returns one result per job, in input order, with 'status' set to
+    'created', 'updated', 'duplicate' or 'error', 'zoho_id' for written
+    jobs and 'junction' telling whether its Account_X_Job link was written.
+    """
+    modo = modo or ZOHO_WRITE_MODE
+    resultados = [{'indeed_id': job_data['id'], 'company_id': company_id, 'status': None,
+                   'zoho_id': None, 'junction': False}
+                  for job_data, company_id in trabajos]
+    
+    try:
+        en_zoho = find_existing(access_token, JOBS_MODULE, 'ID_Indeed', [job_data['id'] for job_data, _ in trabajos])
+    except Exception as e:
+        app.logger.warning(f"Could not look up jobs in bulk, searching one by one: {e}")
+        en_zoho = None
+    
+    # Filter out jobs that already exist and repeated Indeed IDs within the batch
+    empresas_verificadas = {}
+    vistos = set()
+    pendientes = []
+    for i, (job_data, company_id) in enumerate(trabajos):
+        indeed_id = job_data['id']
+        if indeed_id in vistos:
+            existe = True
+        elif en_zoho is not None:
+            existe = indeed_id.lower() in en_zoho
+        else:
+            existe = buscar_trabajo_en_zoho(access_token, indeed_id)
+        if existe:
+            app.logger.info(f"Job with Indeed ID '{indeed_id}' already exists. Skipping.")
+            resultados[i]['status'] = 'duplicate'
+            continue
+        vistos.add(indeed_id)
+        
+        # Verify each company once rather than once per job
+        if company_id not in empresas_verificadas:
+            empresas_verificadas[company_id] = verificar_id_empresa(access_token, company_id)
+        if not empresas_verificadas[company_id]:
+            app.logger.error(f"Company ID {company_id} is not valid")
+            resultados[i]['status'] = 'error'
+            continue
+        
+        pendientes.append(i)
+    
+    procesados = len(trabajos) - len(pendientes)
+    for lote in chunked(pendientes, MAX_RECORDS_PER_CALL):
+        registros = [construir_registro_trabajo(*trabajos[i]) for i in lote]
+        if modo == 'upsert':
+            respuestas = upsert_records(access_token, JOBS_MODULE, registros, ['ID_Indeed'])
+        else:
+            respuestas = insert_records(access_token, JOBS_MODULE, registros)
+        
+        # Retry the records Zoho rejected with minimal data, as a single batch
+        fallidos = [i for i, r in zip(lote, respuestas) if not r['success']]
+        if fallidos:
+            app.logger.error(f"{len(fallidos)} jobs rejected by Zoho, retrying with minimal data")
+            minimos = [{
+                "Name": trabajos[i][0]['title'],
+                "ID_Indeed": trabajos[i][0]['id'],
+                "Account": {"id": trabajos[i][1]}
+            } for i in fallidos]
+            # Upserted on ID_Indeed so a retry can never add the job twice
+            reintentos = dict(zip(fallidos, upsert_records(access_token, JOBS_MODULE, minimos, ['ID_Indeed'])))
+        else:
+            reintentos = {}
+        
+        enlaces = []
+        for i, respuesta in zip(lote, respuestas):
+            if not respuesta['success']:
+                respuesta = reintentos[i]
+            if respuesta['success'] and respuesta['action'] == 'update':
+                # Already in Zoho; its junction record exists from the first insert
+                resultados[i]['status'] = 'updated'
+                resultados[i]['zoho_id'] = respuesta['id']
+                app.logger.info(f"Job with Indeed ID '{resultados[i]['indeed_id']}' already exists. Updated {respuesta['id']}.")
+            elif respuesta['success']:
+                resultados[i]['status'] = 'created'
+                resultados[i]['zoho_id'] = respuesta['id']
+                app.logger.info(f"Job created with ID: {respuesta['id']}")
+                enlaces.append((respuesta['id'], trabajos[i][1]))
+            else:
+                resultados[i]['status'] = 'error'
+                app.logger.error(f"Error creating job {resultados[i]['indeed_id']}: {respuesta['code']} - {respuesta['message']}")
+        
+        # Link the new jobs to their companies with one junction batch
+        enlaces_fallidos = set(crear_registros_junction_lote(access_token, enlaces))
+        for i in lote:
+            if resultados[i]['status'] == 'created':
+                resultados[i]['junction'] = (resultados[i]['zoho_id'], trabajos[i][1]) not in enlaces_fallidos
+        
+        procesados += len(lote)
+        if progreso:
+            creados = sum(1 for r in resultados if r['status'] == 'created')
+            progreso(procesados, creados, procesados - creados)
+    
+    return resultados
+
 # Contact enrichment functions
 def buscar_contactos_apollo(domain, max_contacts=10, filter_type="all"):
-    """Search contacts in Apollo.io"""
+    """Search contacts in Apollo.io.
+    
+    Raises RateLimitExceeded when Apollo is throttling us and UpstreamError
+    when the search fails in any other way, so callers never mistake a
+    search that did not happen for a domain without contacts: only an empty
+    answer to a successful search returns [].
+    """
     if not domain:
         return []
     
@@ -613,7 +950,7 @@ def buscar_contactos_apollo(domain, max_contacts=10, filter_type="all"):
     
     try:
         app.logger.info(f"Apollo search payload: {json.dumps(payload, indent=2)}")
-        response = requests.post(url, headers=headers, json=payload)
+        response = apollo.post(url, headers=headers, json=payload)
         
         app.logger.info(f"Apollo response status: {response.status_code}")
         
@@ -678,17 +1015,19 @@ def buscar_contactos_apollo(domain, max_contacts=10, filter_type="all"):
             app.logger.info(f"Successfully processed {len(valid_contacts)} contacts with revealed emails")
             return valid_contacts
             
-        elif response.status_code == 429:
-            app.logger.warning(f"Apollo API rate limit exceeded")
-            return []
+        elif is_throttled(response):
+            app.logger.warning("Apollo API rate limit exceeded")
+            raise UpstreamThrottled('apollo', retry_after(response, 60))
         else:
             app.logger.error(f"Apollo API error: {response.status_code}")
             app.logger.error(f"Apollo error response: {response.text}")
-            return []
+            raise UpstreamError('apollo', f"{response.status_code} - {response.text}")
             
+    except (RateLimitExceeded, UpstreamError):
+        raise
     except Exception as e:
         app.logger.error(f"Exception searching Apollo contacts: {e}")
-        return []
+        raise UpstreamError('apollo', e) from e
 
 def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=None, last_name=None):
     """Check if contact already exists in Zoho."""
@@ -697,7 +1036,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=N
         if not first_name or not last_name:
             return False
             
-        url = f"{ZOHO_DOMAIN}/crm/v2/Contacts/search"
+        url = f"{zoho_domain()}/crm/v2/Contacts/search"
         headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
         
         # Search by name and company
@@ -707,7 +1046,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=N
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = zoho_crm.get(url, headers=headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 contacts = data.get('data', [])
@@ -722,7 +1061,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=N
         return False
     
     # Original email check
-    url = f"{ZOHO_DOMAIN}/crm/v2/Contacts/search"
+    url = f"{zoho_domain()}/crm/v2/Contacts/search"
     headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
     
     params = {
@@ -731,7 +1070,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=N
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = zoho_crm.get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             contacts = data.get('data', [])
@@ -750,7 +1089,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id, first_name=N
 
 def verificar_empresa_tiene_contactos(access_token, company_id):
     """Check if a company has any contacts in Zoho."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/Contacts/search"
+    url = f"{zoho_domain()}/crm/v2/Contacts/search"
     headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
     
     params = {
@@ -760,7 +1099,7 @@ def verificar_empresa_tiene_contactos(access_token, company_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = zoho_crm.get(url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -780,43 +1119,45 @@ def verificar_empresa_tiene_contactos(access_token, company_id):
         
     return False, 0
 
-def crear_contacto_zoho(access_token, contact_data, account_id):
-    """Create contact in Zoho CRM."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/Contacts"
-    headers = {
-        'Authorization': f'Zoho-oauthtoken {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
+def construir_registro_contacto(contact_data, account_id):
+    """Build the Zoho Contacts record for an Apollo contact."""
     # Handle Department field - should already be validated in buscar_contactos_apollo
     department = None
     if contact_data.get('departments'):
         department = ', '.join(contact_data.get('departments', []))
     
-    zoho_contact = {
-        "data": [{
-            "First_Name": contact_data['first_name'],
-            "Last_Name": contact_data['last_name'],
-            "Email": contact_data['email'],
-            "Account_Name": {"id": account_id},
-            "Title": contact_data.get('title'),
-            "Phone": contact_data.get('phone'),
-            "LinkedIn": contact_data.get('linkedin_url'),
-            "Mailing_City": contact_data.get('city'),
-            "Mailing_State": contact_data.get('state'),
-            "Mailing_Country": contact_data.get('country'),
-            "Department": department,
-            "Lead_Source": "Apollo.io",
-            "Apollo_ID": contact_data.get('apollo_id'),
-            "Apollo_URL": contact_data.get('apollo_person_url')
-        }]
+    record = {
+        "First_Name": contact_data['first_name'],
+        "Last_Name": contact_data['last_name'],
+        "Email": contact_data['email'],
+        "Account_Name": {"id": account_id},
+        "Title": contact_data.get('title'),
+        "Phone": contact_data.get('phone'),
+        "LinkedIn": contact_data.get('linkedin_url'),
+        "Mailing_City": contact_data.get('city'),
+        "Mailing_State": contact_data.get('state'),
+        "Mailing_Country": contact_data.get('country'),
+        "Department": department,
+        "Lead_Source": "Apollo.io",
+        "Apollo_ID": contact_data.get('apollo_id'),
+        "Apollo_URL": contact_data.get('apollo_person_url')
     }
     
     # Remove None values
-    zoho_contact["data"][0] = {k: v for k, v in zoho_contact["data"][0].items() if v is not None}
+    return {k: v for k, v in record.items() if v is not None}
+
+def crear_contacto_zoho(access_token, contact_data, account_id):
+    """Create contact in Zoho CRM."""
+    url = f"{zoho_domain()}/crm/v2/Contacts"
+    headers = {
+        'Authorization': f'Zoho-oauthtoken {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    zoho_contact = {"data": [construir_registro_contacto(contact_data, account_id)]}
     
     try:
-        response = requests.post(url, headers=headers, json=zoho_contact)
+        response = zoho_crm.post(url, headers=headers, json=zoho_contact)
         
         if response.status_code == 201:
             result = response.json()
@@ -831,9 +1172,78 @@ def crear_contacto_zoho(access_token, contact_data, account_id):
         app.logger.error(f"Exception creating contact: {e}")
         return None
 
+def crear_contactos_zoho_lote(access_token, contacts, account_id, skip_duplicates=True, modo=None):
+    """
+    Create Apollo contacts for one account with batched Zoho writes.
+    
+    In "upsert" mode contacts with an email are written in a single upsert
+    deduplicated on Email; the rest are inserted. With skip_duplicates,
+    contacts already in Zoho are left alone rather than upserted, which
+    would overwrite them and move them to this account: in "upsert" mode
+    their emails are looked up 50 per COQL query, and contacts without one
+    (and every contact in "insert" mode) are checked by
+    verificar_contacto_existe_zoho.
+    
+    Returns one result per contact, in input order, with 'status' set to
+    'created', 'updated', 'duplicate' or 'error'.
+    """
+    modo = modo or ZOHO_WRITE_MODE
+    resultados = [{'status': None, 'id': None, 'error': None} for _ in contacts]
+    
+    existentes = None
+    if skip_duplicates and modo == 'upsert':
+        try:
+            existentes = find_existing(access_token, 'Contacts', 'Email', [c.get('email') for c in contacts])
+        except Exception as e:
+            app.logger.warning(f"Could not look up contacts in bulk, searching one by one: {e}")
+    
+    upserts = []
+    inserts = []
+    for i, contact in enumerate(contacts):
+        email = contact.get('email')
+        if existentes is not None and email:
+            duplicado = email.lower() in existentes
+        elif skip_duplicates:
+            duplicado = verificar_contacto_existe_zoho(
+                access_token,
+                email,
+                account_id,
+                contact.get('first_name'),
+                contact.get('last_name')
+            )
+        else:
+            duplicado = False
+        
+        if duplicado:
+            resultados[i]['status'] = 'duplicate'
+            app.logger.info(f"Skipped duplicate contact: {contact.get('first_name')} {contact.get('last_name')}")
+        elif modo == 'upsert' and email:
+            upserts.append(i)
+        else:
+            inserts.append(i)
+    
+    escrituras = []
+    if upserts:
+        registros = [construir_registro_contacto(contacts[i], account_id) for i in upserts]
+        escrituras.extend(zip(upserts, upsert_records(access_token, 'Contacts', registros, ['Email'])))
+    if inserts:
+        registros = [construir_registro_contacto(contacts[i], account_id) for i in inserts]
+        escrituras.extend(zip(inserts, insert_records(access_token, 'Contacts', registros)))
+    
+    for i, respuesta in escrituras:
+        if respuesta['success']:
+            resultados[i]['status'] = 'updated' if respuesta['action'] == 'update' else 'created'
+            resultados[i]['id'] = respuesta['id']
+        else:
+            resultados[i]['status'] = 'error'
+            resultados[i]['error'] = f"{respuesta['code']} - {respuesta['message']}"
+            app.logger.error(f"Error creating contact: {resultados[i]['error']}")
+    
+    return resultados
+
 def actualizar_apollo_contact_field(access_token, company_id, has_no_apollo_contacts):
     """Update Apollo_Contact field in Zoho to mark companies with no Apollo contacts."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/Accounts/{company_id}"
+    url = f"{zoho_domain()}/crm/v2/Accounts/{company_id}"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
@@ -848,7 +1258,7 @@ def actualizar_apollo_contact_field(access_token, company_id, has_no_apollo_cont
     }
     
     try:
-        response = requests.put(url, headers=headers, json=data)
+        response = zoho_crm.put(url, headers=headers, json=data)
         
         if response.status_code == 200:
             app.logger.info(f"Successfully updated Apollo_Contact field for company {company_id} to {'true' if has_no_apollo_contacts else 'false'}")
@@ -865,12 +1275,12 @@ def actualizar_apollo_contact_field(access_token, company_id, has_no_apollo_cont
 
 def verificar_apollo_contact_field(access_token, company_id):
     """Check if company is marked as having no Apollo contacts."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/Accounts/{company_id}"
+    url = f"{zoho_domain()}/crm/v2/Accounts/{company_id}"
     headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
     params = {'fields': 'Apollo_Contact'}
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = zoho_crm.get(url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -889,15 +1299,59 @@ def verificar_apollo_contact_field(access_token, company_id):
         
     return False
 
+def obtener_ids_empresas_con_contactos(access_token):
+    """Get the IDs of all companies that have at least one contact.
+    
+    Pages through Contacts once (200 per call) instead of probing each
+    company, and raises if the scan cannot be completed.
+    """
+    url = f"{zoho_domain()}/crm/v2/Contacts"
+    headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
+    ids_con_contactos = set()
+    page = 1
+    
+    while True:
+        params = {
+            'page': page,
+            'per_page': 200,
+            'fields': 'Account_Name'
+        }
+        response = zoho_crm.get(url, headers=headers, params=params)
+        
+        if response.status_code == 204:
+            break
+        if response.status_code != 200:
+            raise Exception(f"Error getting contacts: {response.status_code} - {response.text}")
+        
+        data = response.json()
+        for contact in data.get('data', []):
+            account = contact.get('Account_Name')
+            if isinstance(account, dict) and account.get('id'):
+                ids_con_contactos.add(account['id'])
+        
+        if not data.get('info', {}).get('more_records', False):
+            break
+        page += 1
+    
+    app.logger.info(f"Found {len(ids_con_contactos)} companies with contacts ({page} contact pages)")
+    return ids_con_contactos
+
 def obtener_empresas_sin_contactos(access_token, limit=None):
     """Get companies that don't have any contacts."""
     empresas_sin_contactos = []
     page = 1
     per_page = 200
     
+    # Companies with contacts, collected once and anti-joined locally
+    try:
+        ids_con_contactos = obtener_ids_empresas_con_contactos(access_token)
+    except Exception as e:
+        app.logger.error(f"Exception getting companies with contacts: {e}")
+        return empresas_sin_contactos
+    
     while True:
         # Get companies
-        url = f"{ZOHO_DOMAIN}/crm/v2/Accounts"
+        url = f"{zoho_domain()}/crm/v2/Accounts"
         headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
         params = {
             'page': page,
@@ -906,7 +1360,7 @@ def obtener_empresas_sin_contactos(access_token, limit=None):
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = zoho_crm.get(url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -930,20 +1384,7 @@ def obtener_empresas_sin_contactos(access_token, limit=None):
                         continue
                     
                     # Check if company has contacts
-                    contacts_url = f"{ZOHO_DOMAIN}/crm/v2/Contacts/search"
-                    contacts_params = {
-                        'criteria': f'Account_Name.id:equals:{company_id}',
-                        'page': 1,
-                        'per_page': 1
-                    }
-                    
-                    contacts_response = requests.get(contacts_url, headers=headers, params=contacts_params)
-                    
-                    # If 204 (no content) or no data, company has no contacts
-                    if contacts_response.status_code == 204 or (
-                        contacts_response.status_code == 200 and 
-                        len(contacts_response.json().get('data', [])) == 0
-                    ):
+                    if company_id not in ids_con_contactos:
                         empresas_sin_contactos.append({
                             'id': company_id,
                             'name': company_name,
@@ -1009,120 +1450,48 @@ def scrape_jobs_endpoint():
     """
     Main endpoint for scraping jobs and saving to Zoho.
     
+    "queries" scrapes several search_term/location combinations in one call,
+    SCRAPE_QUERY_WORKERS at a time, merging their jobs by Indeed ID; fields
+    a query leaves out come from the top level.
+    
     Expected JSON payload:
     {
         "search_term": "Call Center",
         "location": "Arizona, USA",
         "results_wanted": 50,
         "hours_old": 1440,
-        "country": "USA"
+        "country": "USA",
+        "queries": [  // Optional
+            {"search_term": "Call Center", "location": "Phoenix, AZ"},
+            {"search_term": "Customer Service", "location": "Tucson, AZ", "results_wanted": 100}
+        ]
     }
     """
     try:
         # Get request data
         data = request.get_json()
         
-        # Validate required fields
-        search_term = data.get('search_term', 'Call Center')
-        location = data.get('location', '')
-        results_wanted = int(data.get('results_wanted', 50))
-        hours_old = int(data.get('hours_old', 1440))
-        country = data.get('country', 'USA')
-        
-        app.logger.info(f"Starting job scrape: search_term={search_term}, location={location}, results={results_wanted}")
-        
-        # Get Zoho access token
-        access_token = get_access_token()
-        
-        # Scrape jobs from Indeed
-        jobs = scrape_jobs(
-            site_name=["indeed"],
-            search_term=search_term,
-            location=location,
-            results_wanted=results_wanted,
-            hours_old=hours_old,
-            country_indeed=country,
-        )
-        
-        app.logger.info(f"Found {len(jobs)} jobs from Indeed")
-        
-        # Filter columns
-        columnas_deseadas = ['id', 'title', 'company', 'location', 'job_url', 'job_url_direct', 
-                           'company_url', 'company_url_direct', 'date_posted', 'description']
-        
-        for col in columnas_deseadas:
-            if col not in jobs.columns:
-                jobs[col] = None
-        
-        jobs_filtrados = jobs[columnas_deseadas].copy()
-        jobs_filtrados = jobs_filtrados.fillna('')
+        # Queries to scrape; a payload without "queries" is a single query
+        try:
+            consultas = consultas_de_scraping(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e), 'timestamp': datetime.now().isoformat()}), 400
         
-        # Process statistics
-        contador_insertados = 0
-        contador_omitidos = 0
-        contador_empresas_existentes = 0
-        contador_empresas_nuevas = 0
+        app.logger.info(f"Starting job scrape: {len(consultas)} queries")
         
-        # Company cache
-        cache_empresas = {}
+        def al_terminar(jobs):
+            app.logger.info(f"Found {len(jobs)} jobs from Indeed")
         
-        # Process each job
-        for index, row in jobs_filtrados.iterrows():
-            try:
-                company_name = row['company'].strip()
-                company_website = row['company_url_direct'].strip()
-                
-                if not company_name:
-                    company_name = "Unknown Company"
-                
-                if not company_website:
-                    company_website = ""
-                
-                # Check company cache
-                if company_name in cache_empresas:
-                    company_id = cache_empresas[company_name]
-                else:
-                    # Search for company in Zoho
-                    company_id = buscar_empresa_en_zoho(access_token, company_name)
-                    
-                    # Create if not exists
-                    if not company_id:
-                        try:
-                            company_id = crear_empresa_en_zoho(access_token, company_name, company_website)
-                            contador_empresas_nuevas += 1
-                        except Exception as e:
-                            app.logger.error(f"Error creating company '{company_name}': {e}")
-                            continue
-                    else:
-                        contador_empresas_existentes += 1
-                    
-                    # Save to cache
-                    cache_empresas[company_name] = company_id
-                
-                # Create job in Zoho
-                job_data_dict = row.to_dict()
-                
-                if crear_trabajo_en_zoho(access_token, job_data_dict, company_id):
-                    contador_insertados += 1
-                else:
-                    contador_omitidos += 1
-                
-                # Rate limiting
-                time.sleep(random.uniform(0.5, 1.5))
-                
-            except Exception as e:
-                app.logger.error(f"Error processing job: {e}")
+        # Queries scraped in parallel; each one's jobs are prepared, matched to
+        # companies and written to Zoho by the pipeline stages as soon as it finishes
+        informe = []
+        summary = procesar_scraping_en_etapas(lotes_de_consultas(consultas, informe, al_terminar))
+        summary['queries'] = informe
         
         # Return results
         result = {
             'success': True,
-            'summary': {
-                'total_jobs_found': len(jobs_filtrados),
-                'jobs_created': contador_insertados,
-                'jobs_skipped': contador_omitidos,
-                'existing_companies_used': contador_empresas_existentes,
-                'new_companies_created': contador_empresas_nuevas
-            },
+            'summary': summary,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -1190,6 +1559,9 @@ def search_contacts():
             'timestamp': datetime.now().isoformat()
         })
         
+    except RateLimitExceeded as e:
+        app.logger.warning(f"Apollo throttled search_contacts: {e}")
+        return respuesta_limite_apollo(e)
     except Exception as e:
         app.logger.error(f"Error in search_contacts: {e}")
         return jsonify({
@@ -1305,34 +1677,20 @@ def enrich_contacts():
         
         # Create contacts in Zoho
         created_count = 0
+        updated_count = 0
         skipped_count = 0
         errors = []
         
-        for contact in contacts:
-            try:
-                # Check if contact already exists
-                if skip_duplicates and verificar_contacto_existe_zoho(
-                    access_token, 
-                    contact.get('email'), 
-                    company_id,
-                    contact.get('first_name'),
-                    contact.get('last_name')
-                ):
-                    skipped_count += 1
-                    app.logger.info(f"Skipped duplicate contact: {contact.get('first_name')} {contact.get('last_name')}")
-                    continue
-                
-                # Create contact
-                contact_id = crear_contacto_zoho(access_token, contact, company_id)
-                if contact_id:
-                    created_count += 1
-                else:
-                    errors.append(f"Failed to create contact: {contact.get('first_name')} {contact.get('last_name')}")
-                    
-            except Exception as e:
-                error_msg = f"Error processing contact {contact.get('first_name', '')} {contact.get('last_name', '')}: {str(e)}"
-                app.logger.error(error_msg)
-                errors.append(error_msg)
+        resultados = crear_contactos_zoho_lote(access_token, contacts, company_id, skip_duplicates)
+        for contact, resultado in zip(contacts, resultados):
+            if resultado['status'] == 'created':
+                created_count += 1
+            elif resultado['status'] == 'updated':
+                updated_count += 1
+            elif resultado['status'] == 'duplicate':
+                skipped_count += 1
+            else:
+                errors.append(f"Failed to create contact: {contact.get('first_name')} {contact.get('last_name')} ({resultado['error']})")
         
         result = {
             'success': True,
@@ -1344,6 +1702,7 @@ def enrich_contacts():
             'summary': {
                 'contacts_found': len(contacts),
                 'contacts_created': created_count,
+                'contacts_updated': updated_count,
                 'contacts_skipped': skipped_count,
                 'errors': len(errors)
             },
@@ -1355,6 +1714,18 @@ def enrich_contacts():
         
         return jsonify(result)
         
+    except RateLimitExceeded as e:
+        # Not marked in Apollo_Contact: the company was never actually searched
+        app.logger.warning(f"Apollo throttled enrich_contacts: {e}")
+        return respuesta_limite_apollo(e)
+    except UpstreamError as e:
+        # Not marked either: a failed search says nothing about the company
+        app.logger.error(f"Apollo search failed in enrich_contacts: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 502
     except Exception as e:
         app.logger.error(f"Error in enrich_contacts: {e}")
         return jsonify({
@@ -1363,6 +1734,222 @@ def enrich_contacts():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def consultar_coql(access_token, query):
+    """Run a COQL query and return (records, more_records)."""
+    url = f"{zoho_domain()}/crm/v2/coql"
+    headers = {
+        'Authorization': f'Zoho-oauthtoken {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    response = zoho_crm.post(url, headers=headers, json={'select_query': query})
+    
+    if response.status_code == 204:
+        return [], False
+    if response.status_code != 200:
+        raise Exception(f"COQL query failed: {response.status_code} - {response.text}")
+    
+    data = response.json()
+    return data.get('data', []), data.get('info', {}).get('more_records', False)
+
+def obtener_ids_con_contactos_de(access_token, company_ids):
+    """Get which of the given company IDs have at least one contact."""
+    ids_con_contactos = set()
+    
+    # COQL accepts at most 50 values in an IN clause
+    for inicio in range(0, len(company_ids), 50):
+        grupo = company_ids[inicio:inicio + 50]
+        valores = ', '.join(f"'{company_id}'" for company_id in grupo)
+        offset = 0
+        while True:
+            contactos, hay_mas = consultar_coql(
+                access_token,
+                f"select Account_Name from Contacts where Account_Name in ({valores}) "
+                f"limit {offset}, 200"
+            )
+            for contacto in contactos:
+                account = contacto.get('Account_Name')
+                if isinstance(account, dict) and account.get('id'):
+                    ids_con_contactos.add(account['id'])
+            if not hay_mas:
+                break
+            offset += 200
+    
+    return ids_con_contactos
+
+def obtener_lote_empresas_sin_contactos(access_token, after_id=None, limit=10):
+    """Get the next companies without contacts, in Account id order.
+    
+    Keyset pagination: only accounts with an id greater than after_id are
+    read, so each chunk costs a few calls however far into the set it is.
+    Returns (companies, last_id, has_more); pass last_id back as after_id
+    to continue.
+    """
+    empresas_sin_contactos = []
+    last_id = after_id
+    
+    while len(empresas_sin_contactos) < limit:
+        # Unquoted, so Zoho compares the ids as numbers rather than as text
+        condicion = f"id > {int(last_id)}" if last_id else "id is not null"
+        companies, hay_mas = consultar_coql(
+            access_token,
+            f"select id, Account_Name, Website, Apollo_Contact from Accounts "
+            f"where {condicion} order by id asc limit 200"
+        )
+        if not companies:
+            return empresas_sin_contactos, last_id, False
+        
+        # Skip companies marked as having no Apollo contacts
+        candidatas = [
+            c for c in companies
+            if not (c.get('Apollo_Contact') == True or str(c.get('Apollo_Contact')).lower() == 'true')
+        ]
+        ids_con_contactos = obtener_ids_con_contactos_de(access_token, [c['id'] for c in candidatas])
+        candidatas = {c['id'] for c in candidatas if c['id'] not in ids_con_contactos}
+        
+        for company in companies:
+            last_id = company['id']
+            if company['id'] in candidatas:
+                empresas_sin_contactos.append({
+                    'id': company['id'],
+                    'name': company.get('Account_Name', 'Unknown'),
+                    'website': company.get('Website') or '',
+                    'apollo_contact': company.get('Apollo_Contact', 'false')
+                })
+                if len(empresas_sin_contactos) >= limit:
+                    # Stopped mid-page: the rest of the page comes next time
+                    return empresas_sin_contactos, last_id, company is not companies[-1] or hay_mas
+        
+        if not hay_mas:
+            return empresas_sin_contactos, last_id, False
+    
+    return empresas_sin_contactos, last_id, True
+
+def resultado_empresa(company, status, **extra):
+    """Per-company entry of a bulk enrichment report."""
+    return dict({
+        'id': company['id'],
+        'name': company['name'],
+        'website': company['website'],
+        'status': status
+    }, **extra)
+
+def agrupar_empresas_por_dominio(companies):
+    """Group companies by website domain, keeping the order they came in.
+    
+    Returns ({domain: [companies]}, skipped results for companies without a
+    usable website).
+    """
+    grupos = {}
+    omitidas = []
+    for company in companies:
+        if not company.get('website'):
+            omitidas.append(resultado_empresa(company, 'skipped', reason='No website'))
+            continue
+        dominio = obtener_dominio_desde_url(company['website'])
+        if not dominio:
+            omitidas.append(resultado_empresa(company, 'skipped', reason='Invalid website domain'))
+            continue
+        grupos.setdefault(dominio, []).append(company)
+    return grupos, omitidas
+
+def repartir_contactos(contacts, total_empresas, regla):
+    """Split a domain's contacts among the companies sharing it.
+    
+    first: all to the first company; split: dealt out in turn; all: every
+    company gets every contact.
+    """
+    if regla == 'all':
+        return [list(contacts) for _ in range(total_empresas)]
+    if regla == 'split':
+        return [contacts[i::total_empresas] for i in range(total_empresas)]
+    return [list(contacts)] + [[] for _ in range(total_empresas - 1)]
+
+def enriquecer_grupo_dominio(access_token, dominio, empresas, contacts_per_company, filter_type, regla):
+    """Search Apollo once for a domain and give its contacts to the companies sharing it.
+    
+    Returns one result per company. Raises RateLimitExceeded if Apollo is
+    throttling, before anything is written or marked.
+    """
+    max_contacts = contacts_per_company * len(empresas) if regla == 'split' else contacts_per_company
+    contacts = buscar_contactos_apollo(dominio, max_contacts, filter_type)
+    if len(empresas) > 1:
+        app.logger.info(f"Domain {dominio} shared by {len(empresas)} companies: one Apollo search, rule '{regla}'")
+    
+    resultados = []
+    if not contacts:
+        for company in empresas:
+            # Mark company as having no Apollo contacts
+            app.logger.info(f"No contacts found for company {company['name']}. Marking Apollo_Contact as true.")
+            update_result = actualizar_apollo_contact_field(access_token, company['id'], True)
+            app.logger.info(f"Apollo_Contact field update result for {company['name']}: {update_result}")
+            resultados.append(resultado_empresa(company, 'no_contacts_found', contacts_found=0, apollo_marked=True))
+        return resultados
+    
+    for company, asignados in zip(empresas, repartir_contactos(contacts, len(empresas), regla)):
+        if not asignados:
+            # The domain's contacts went to the other companies; Apollo does
+            # have contacts for it, so Apollo_Contact is left alone
+            resultados.append(resultado_empresa(
+                company, 'skipped', reason=f"Contacts of shared domain {dominio} assigned to other companies",
+                shared_domain=dominio
+            ))
+            continue
+        
+        # Contacts already in Zoho, e.g. from the 'all' rule or an earlier run, are skipped
+        creados = crear_contactos_zoho_lote(access_token, asignados, company['id'], skip_duplicates=True)
+        resultados.append(resultado_empresa(
+            company, 'enriched', contacts_found=len(asignados),
+            contacts_created=sum(1 for r in creados if r['status'] == 'created'),
+            contacts_skipped=sum(1 for r in creados if r['status'] == 'duplicate')
+        ))
+    return resultados
+
+def enriquecer_grupos_en_paralelo(access_token, grupos, contacts_per_company, filter_type, regla):
+    """Run enriquecer_grupo_dominio for every domain, ENRICH_WORKERS at a time.
+    
+    The shared rate limiters pace the Apollo and Zoho calls the workers make.
+    Returns ({company id: result}, RateLimitExceeded or None). Once Apollo
+    throttles no further domain is started: the throttled domain's companies
+    are reported as 'throttled' and those never started are left out.
+    """
+    resultados = {}
+    limite = None
+    pendientes = iter(grupos.items())
+    en_vuelo = {}
+    
+    def lanzar(pool):
+        for dominio, empresas in pendientes:
+            futuro = pool.submit(
+                enriquecer_grupo_dominio, access_token, dominio, empresas, contacts_per_company, filter_type, regla
+            )
+            en_vuelo[futuro] = (dominio, empresas)
+            if len(en_vuelo) >= ENRICH_WORKERS:
+                break
+    
+    with ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix='enrich-contacts') as pool:
+        lanzar(pool)
+        while en_vuelo:
+            terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                dominio, empresas = en_vuelo.pop(futuro)
+                try:
+                    for company_result in futuro.result():
+                        resultados[company_result['id']] = company_result
+                except RateLimitExceeded as e:
+                    # Nothing was written or marked for this domain
+                    app.logger.warning(f"Apollo throttled at domain {dominio}: {e}")
+                    limite = limite or e
+                    for company in empresas:
+                        resultados[company['id']] = resultado_empresa(company, 'throttled')
+                except Exception as e:
+                    app.logger.error(f"Error processing domain {dominio}: {e}")
+                    for company in empresas:
+                        resultados[company['id']] = resultado_empresa(company, 'error', error=str(e))
+            if limite is None:
+                lanzar(pool)
+    return resultados, limite
+
 @app.route('/enrich_companies_without_contacts', methods=['POST'])
 @require_api_key
 def enrich_companies_without_contacts():
@@ -1374,6 +1961,7 @@ def enrich_companies_without_contacts():
         "max_companies": 10,  // Optional: omit or set to 0 to process ALL companies
         "contacts_per_company": 5,
         "filter_type": "managers",
+        "domain_assignment": "first",  // Companies sharing a domain: first | split | all
         "dry_run": false
     }
     """
@@ -1393,6 +1981,9 @@ def enrich_companies_without_contacts():
         contacts_per_company = int(data.get('contacts_per_company', 5))
         filter_type = data.get('filter_type', 'managers')
         dry_run = data.get('dry_run', False)
+        domain_assignment = data.get('domain_assignment', ENRICH_DOMAIN_ASSIGNMENT)
+        if domain_assignment not in DOMAIN_ASSIGNMENTS:
+            return jsonify({'error': f"Invalid domain_assignment. Use: {', '.join(DOMAIN_ASSIGNMENTS)}"}), 400
         
         app.logger.info(f"Starting bulk enrichment: max_companies={'ALL' if max_companies is None else max_companies}, dry_run={dry_run}")
         
@@ -1432,75 +2023,28 @@ def enrich_companies_without_contacts():
                 'timestamp': datetime.now().isoformat()
             })
         
-        # Process each company
+        # One Apollo search per website domain, several domains at a time; companies
+        # sharing a domain get its contacts by domain_assignment
+        grupos, omitidas = agrupar_empresas_por_dominio(companies_without_contacts)
+        por_empresa, limite = enriquecer_grupos_en_paralelo(
+            access_token, grupos, contacts_per_company, filter_type, domain_assignment
+        )
+        por_empresa.update((company_result['id'], company_result) for company_result in omitidas)
+        if limite:
+            results['throttled'] = True
+            results['retry_after'] = int(limite.wait) + 1
+        
+        # Report companies in the order they were read
         for company in companies_without_contacts:
-            company_result = {
-                'id': company['id'],
-                'name': company['name'],
-                'website': company['website'],
-                'status': 'pending'
-            }
-            
-            try:
-                # Skip if no website
-                if not company['website']:
-                    company_result['status'] = 'skipped'
-                    company_result['reason'] = 'No website'
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Extract domain
-                domain = obtener_dominio_desde_url(company['website'])
-                if not domain:
-                    company_result['status'] = 'skipped'
-                    company_result['reason'] = 'Invalid website domain'
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Search contacts in Apollo
-                contacts = buscar_contactos_apollo(domain, contacts_per_company, filter_type)
-                
-                if not contacts:
-                    # Mark company as having no Apollo contacts
-                    app.logger.info(f"No contacts found for company {company['name']}. Marking Apollo_Contact as true.")
-                    update_result = actualizar_apollo_contact_field(access_token, company['id'], True)
-                    app.logger.info(f"Apollo_Contact field update result for {company['name']}: {update_result}")
-                    
-                    company_result['status'] = 'no_contacts_found'
-                    company_result['contacts_found'] = 0
-                    company_result['apollo_marked'] = True
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Create contacts in Zoho
-                created_count = 0
-                for contact in contacts:
-                    try:
-                        contact_id = crear_contacto_zoho(access_token, contact, company['id'])
-                        if contact_id:
-                            created_count += 1
-                    except Exception as e:
-                        app.logger.error(f"Error creating contact: {e}")
-                
-                company_result['status'] = 'enriched'
-                company_result['contacts_found'] = len(contacts)
-                company_result['contacts_created'] = created_count
+            company_result = por_empresa.get(company['id'])
+            if company_result is None:
+                continue
+            if company_result['status'] == 'enriched':
                 results['companies_enriched'] += 1
-                results['total_contacts_created'] += created_count
-                
-            except Exception as e:
-                company_result['status'] = 'error'
-                company_result['error'] = str(e)
+                results['total_contacts_created'] += company_result['contacts_created']
+            elif company_result['status'] != 'throttled':
                 results['companies_skipped'] += 1
-                app.logger.error(f"Error processing company {company['name']}: {e}")
-            
             results['companies'].append(company_result)
-            
-            # Small delay between companies to avoid rate limits
-            time.sleep(1)
         
         return jsonify({
             'success': True,
@@ -1526,9 +2070,11 @@ def enrich_companies_chunked():
     Expected JSON payload:
     {
         "chunk_size": 20,        // Number of companies per chunk (default: 20)
-        "start_offset": 0,       // Skip this many companies (for pagination)
+        "cursor": "...",         // next_cursor from the previous chunk (omit to start)
+        "start_offset": 0,       // Deprecated: skip this many companies when starting
         "contacts_per_company": 5,
         "filter_type": "managers",
+        "domain_assignment": "first",      // Companies sharing a domain: first | split | all
         "session_id": "unique-session-id"  // Optional: for tracking progress
     }
     """
@@ -1539,18 +2085,38 @@ def enrich_companies_chunked():
         start_offset = int(data.get('start_offset', 0))
         contacts_per_company = int(data.get('contacts_per_company', 3))  # Reduced contacts
         filter_type = data.get('filter_type', 'managers')
+        domain_assignment = data.get('domain_assignment', ENRICH_DOMAIN_ASSIGNMENT)
+        if domain_assignment not in DOMAIN_ASSIGNMENTS:
+            return jsonify({'error': f"Invalid domain_assignment. Use: {', '.join(DOMAIN_ASSIGNMENTS)}"}), 400
         session_id = data.get('session_id', datetime.now().isoformat())
+        cursor = data.get('cursor')
         
         app.logger.info(f"Processing chunk: size={chunk_size}, offset={start_offset}, session={session_id}")
         
         # Get Zoho access token
         access_token = get_access_token()
         
-        # Get companies without contacts (limited to chunk_size)
-        all_companies = obtener_empresas_sin_contactos(access_token, None)
-        
-        # Apply offset and limit
-        companies_chunk = all_companies[start_offset:start_offset + chunk_size]
+        if cursor:
+            try:
+                estado = decode_cursor(cursor)
+                if not str(estado.get('after_id') or 0).isdigit():
+                    raise ValueError("Invalid cursor: bad position")
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e), 'session_id': session_id}), 400
+        else:
+            # New pass. The companies are not counted up front: that would take
+            # the full scan the keyset cursor avoids, so the total is only
+            # reported once the last chunk is out
+            estado = {'after_id': None, 'processed': 0}
+            if start_offset:
+                _, estado['after_id'], _ = obtener_lote_empresas_sin_contactos(access_token, None, start_offset)
+                estado['processed'] = start_offset
+        
+        # Only this chunk's slice is read, starting after the last Account id handed out
+        companies_chunk, last_id, has_more = obtener_lote_empresas_sin_contactos(
+            access_token, estado.get('after_id'), chunk_size
+        )
+        offset_actual = estado.get('processed', 0)
         
         if not companies_chunk:
             return jsonify({
@@ -1558,11 +2124,12 @@ def enrich_companies_chunked():
                 'message': 'No more companies to process',
                 'session_id': session_id,
                 'chunk_info': {
-                    'offset': start_offset,
+                    'offset': offset_actual,
                     'chunk_size': chunk_size,
                     'companies_processed': 0,
-                    'total_companies': len(all_companies),
-                    'has_more': False
+                    'total_companies': offset_actual,
+                    'has_more': False,
+                    'next_cursor': None
                 },
                 'timestamp': datetime.now().isoformat()
             })
@@ -1576,91 +2143,55 @@ def enrich_companies_chunked():
             'companies': []
         }
         
+        # One Apollo search per website domain, several domains at a time; companies
+        # sharing a domain get its contacts by domain_assignment
+        grupos, omitidas = agrupar_empresas_por_dominio(companies_chunk)
+        por_empresa, limite = enriquecer_grupos_en_paralelo(
+            access_token, grupos, contacts_per_company, filter_type, domain_assignment
+        )
+        por_empresa.update((company_result['id'], company_result) for company_result in omitidas)
+        if limite:
+            results['throttled'] = True
+            results['retry_after'] = int(limite.wait) + 1
+        
+        # Report companies in the order they were read
         for company in companies_chunk:
-            company_result = {
-                'id': company['id'],
-                'name': company['name'],
-                'website': company['website'],
-                'status': 'pending'
-            }
-            
-            try:
-                # Skip if no website
-                if not company['website']:
-                    company_result['status'] = 'skipped'
-                    company_result['reason'] = 'No website'
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Extract domain
-                domain = obtener_dominio_desde_url(company['website'])
-                if not domain:
-                    company_result['status'] = 'skipped'
-                    company_result['reason'] = 'Invalid website domain'
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Search contacts in Apollo
-                contacts = buscar_contactos_apollo(domain, contacts_per_company, filter_type)
-                
-                if not contacts:
-                    # Mark company as having no Apollo contacts
-                    app.logger.info(f"No contacts found for company {company['name']}. Marking Apollo_Contact as true.")
-                    update_result = actualizar_apollo_contact_field(access_token, company['id'], True)
-                    app.logger.info(f"Apollo_Contact field update result for {company['name']}: {update_result}")
-                    
-                    company_result['status'] = 'no_contacts_found'
-                    company_result['contacts_found'] = 0
-                    company_result['apollo_marked'] = True
-                    results['companies_skipped'] += 1
-                    results['companies'].append(company_result)
-                    continue
-                
-                # Create contacts in Zoho
-                created_count = 0
-                for contact in contacts:
-                    try:
-                        contact_id = crear_contacto_zoho(access_token, contact, company['id'])
-                        if contact_id:
-                            created_count += 1
-                    except Exception as e:
-                        app.logger.error(f"Error creating contact: {e}")
-                
-                company_result['status'] = 'enriched'
-                company_result['contacts_found'] = len(contacts)
-                company_result['contacts_created'] = created_count
+            company_result = por_empresa.get(company['id'])
+            if company_result is None:
+                continue
+            if company_result['status'] == 'enriched':
                 results['companies_enriched'] += 1
-                results['total_contacts_created'] += created_count
-                
-            except Exception as e:
-                company_result['status'] = 'error'
-                company_result['error'] = str(e)
+                results['total_contacts_created'] += company_result['contacts_created']
+            elif company_result['status'] != 'throttled':
                 results['companies_skipped'] += 1
-                app.logger.error(f"Error processing company {company['name']}: {e}")
-            
             results['companies'].append(company_result)
-            
-            # Small delay between companies to avoid rate limits
-            time.sleep(0.5)  # Reduced delay for chunked processing
         
-        # Check if there are more companies to process
-        has_more = (start_offset + chunk_size) < len(all_companies)
-        next_offset = start_offset + chunk_size if has_more else None
+        # Cursor for the next chunk; a throttled chunk resumes at the refused company
+        atendidas = len(companies_chunk)
+        if results.get('throttled'):
+            hechas = {c['id'] for c in results['companies'] if c['status'] != 'throttled'}
+            atendidas = next((i for i, c in enumerate(companies_chunk) if c['id'] not in hechas), atendidas)
+            last_id = companies_chunk[atendidas - 1]['id'] if atendidas else estado.get('after_id')
+            has_more = True
+        procesadas = offset_actual + atendidas
+        siguiente = encode_cursor({'after_id': last_id, 'processed': procesadas})
+        next_cursor = siguiente if has_more else None
         
         return jsonify({
             'success': True,
             'session_id': session_id,
             'results': results,
             'chunk_info': {
-                'offset': start_offset,
+                'offset': offset_actual,
                 'chunk_size': chunk_size,
-                'companies_processed': len(companies_chunk),
-                'total_companies': len(all_companies),
+                'companies_processed': atendidas,
+                'total_companies': None if has_more else procesadas,
                 'has_more': has_more,
-                'next_offset': next_offset,
-                'progress_percentage': round(((start_offset + len(companies_chunk)) / len(all_companies)) * 100, 2) if all_companies else 100
+                'next_offset': procesadas if has_more else None,
+                'next_cursor': next_cursor,
+                'progress_percentage': None if has_more else 100,
+                'throttled': results.get('throttled', False),
+                'retry_after': results.get('retry_after')
             },
             'timestamp': datetime.now().isoformat()
         })
@@ -1684,7 +2215,8 @@ def enrich_mini_batch():
     Expected JSON payload:
     {
         "batch_size": 5,
-        "start_offset": 0
+        "cursor": "...",     // next_cursor from the previous batch (omit to start)
+        "start_offset": 0    // Deprecated: skip this many companies when starting
     }
     """
     try:
@@ -1698,20 +2230,32 @@ def enrich_mini_batch():
         # Get Zoho access token
         access_token = get_access_token()
         
-        # Get limited companies without contacts
-        all_companies = obtener_empresas_sin_contactos(access_token, start_offset + batch_size)
-        
-        # Get only the specific batch
-        companies_batch = all_companies[start_offset:start_offset + batch_size]
+        if data.get('cursor'):
+            try:
+                estado = decode_cursor(data['cursor'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        else:
+            estado = {'after_id': None, 'processed': 0}
+            if start_offset:
+                _, estado['after_id'], _ = obtener_lote_empresas_sin_contactos(access_token, None, start_offset)
+                estado['processed'] = start_offset
+        
+        # Get only the specific batch, starting after the last Account id handed out
+        companies_batch, last_id, has_more = obtener_lote_empresas_sin_contactos(
+            access_token, estado.get('after_id'), batch_size
+        )
+        offset_actual = estado.get('processed', 0)
         
         if not companies_batch:
             return jsonify({
                 'success': True,
                 'message': 'No companies to process',
                 'batch_info': {
-                    'offset': start_offset,
+                    'offset': offset_actual,
                     'batch_size': batch_size,
                     'companies_processed': 0,
+                    'next_cursor': None,
                     'completed': True
                 }
             })
@@ -1723,45 +2267,49 @@ def enrich_mini_batch():
             'contacts_created': 0
         }
         
+        # One search per website domain, shared by ENRICH_DOMAIN_ASSIGNMENT, several
+        # domains at a time; only 2 contacts per company for speed
+        grupos, omitidas = agrupar_empresas_por_dominio(companies_batch)
+        por_empresa, limite = enriquecer_grupos_en_paralelo(
+            access_token, grupos, 2, 'managers', ENRICH_DOMAIN_ASSIGNMENT
+        )
+        if limite:
+            # Resume at the throttled companies next time instead of marking them
+            results['throttled'] = True
+            results['retry_after'] = int(limite.wait) + 1
+        
+        hechas = {c['id'] for c in omitidas}
         for company in companies_batch:
-            if not company.get('website'):
-                continue
-                
-            domain = obtener_dominio_desde_url(company['website'])
-            if not domain:
+            company_result = por_empresa.get(company['id'])
+            if company_result is None or company_result['status'] == 'throttled':
                 continue
-            
-            # Search only 2 contacts per company for speed
-            contacts = buscar_contactos_apollo(domain, 2, 'managers')
-            
-            if not contacts:
-                actualizar_apollo_contact_field(access_token, company['id'], True)
-            else:
-                for contact in contacts[:2]:  # Max 2 contacts
-                    try:
-                        crear_contacto_zoho(access_token, contact, company['id'])
-                        results['contacts_created'] += 1
-                    except:
-                        pass
+            hechas.add(company['id'])
+            if company_result['status'] == 'enriched':
                 results['companies_enriched'] += 1
-            
+                results['contacts_created'] += company_result['contacts_created']
             results['companies_processed'] += 1
-            
-            # Minimal delay
-            time.sleep(0.2)
         
-        # Calculate if there are more companies
-        has_more = len(all_companies) > (start_offset + batch_size)
+        # Cursor for the next batch; a throttled batch resumes at the refused company
+        atendidas = len(companies_batch)
+        if results.get('throttled'):
+            atendidas = next((i for i, c in enumerate(companies_batch) if c['id'] not in hechas), atendidas)
+            last_id = companies_batch[atendidas - 1]['id'] if atendidas else estado.get('after_id')
+            has_more = True
+        procesadas = offset_actual + atendidas
+        next_cursor = encode_cursor({'after_id': last_id, 'processed': procesadas}) if has_more else None
         
         return jsonify({
             'success': True,
             'results': results,
             'batch_info': {
-                'offset': start_offset,
+                'offset': offset_actual,
                 'batch_size': batch_size,
-                'next_offset': start_offset + batch_size if has_more else None,
+                'next_offset': procesadas if has_more else None,
+                'next_cursor': next_cursor,
                 'has_more': has_more,
-                'completed': not has_more
+                'completed': not has_more,
+                'throttled': results.get('throttled', False),
+                'retry_after': results.get('retry_after')
             },
             'processing_time': f"{results['companies_processed'] * 2} seconds estimated"
         })
@@ -1791,7 +2339,7 @@ def analyze_companies():
         access_token = get_access_token()
         
         # Get all companies
-        url = f"{ZOHO_DOMAIN}/crm/v2/Accounts"
+        url = f"{zoho_domain()}/crm/v2/Accounts"
         headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
         params = {
             'page': 1,
@@ -1799,7 +2347,7 @@ def analyze_companies():
             'fields': 'id,Account_Name,Website,Apollo_Contact'
         }
         
-        response = requests.get(url, headers=headers, params=params)
+        response = zoho_crm.get(url, headers=headers, params=params)
         
         if response.status_code != 200:
             raise Exception(f"Error getting companies: {response.status_code}")
@@ -1849,14 +2397,14 @@ def analyze_companies():
                 continue
             
             # Check if company has contacts
-            contacts_url = f"{ZOHO_DOMAIN}/crm/v2/Contacts/search"
+            contacts_url = f"{zoho_domain()}/crm/v2/Contacts/search"
             contacts_params = {
                 'criteria': f'Account_Name.id:equals:{company_id}',
                 'page': 1,
                 'per_page': 1
             }
             
-            contacts_response = requests.get(contacts_url, headers=headers, params=contacts_params)
+            contacts_response = zoho_crm.get(contacts_url, headers=headers, params=contacts_params)
             
             if contacts_response.status_code == 204 or (
                 contacts_response.status_code == 200 and 
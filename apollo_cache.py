@@ -0,0 +1,197 @@
+"""
+Persistent cache of Apollo.io responses, keyed by domain.
+
+Every organization enrichment and people search costs Apollo credits, and
+the same domain came back each time a company was re-created or
+re-enriched. Answers are kept in SQLite, shared by every worker, keyed by
+(endpoint, domain, filter_type, page size):
+
+- found data is kept APOLLO_CACHE_TTL_DAYS (default 30);
+- "no organization" and "no people" answers are cached too, as negative
+  entries, for APOLLO_CACHE_NEGATIVE_TTL_DAYS (default 7), since Apollo
+  may add the company later;
+- at most APOLLO_CACHE_MAX_ENTRIES entries (default 50000) are kept, the
+  least recently used going first.
+
+Only the fields the enrichment code reads are kept (slim_people,
+slim_organization), and only real answers are cached, never errors or
+throttled calls. Hit, miss and eviction counters are shared too and
+reported by stats(). The cache never raises: if the local store is
+unavailable every lookup is a miss.
+
+    python apollo_cache.py            show counters and sizes
+    python apollo_cache.py --clear    drop every entry
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from company_index import normalize_domain
+from local_store import connect, transaction
+
+logger = logging.getLogger('job_scraper.apollo_cache')
+
+# Returned by get() on a miss; a negative entry is a hit whose value is empty
+MISS = object()
+
+COUNTERS = ('hits', 'negative_hits', 'misses', 'stores', 'evictions', 'expired')
+
+# Fields of Apollo's answers the enrichment code reads; the rest is not cached
+PERSON_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'title', 'seniority', 'phone', 'linkedin_url',
+    'departments', 'city', 'state', 'country'
+)
+ORGANIZATION_FIELDS = (
+    'id', 'name', 'phone', 'facebook_url', 'linkedin_url', 'twitter_url', 'industry',
+    'annual_revenue', 'estimated_num_employees', 'primary_domain', 'website_url'
+)
+
+
+def slim_organization(organization):
+    if not organization:
+        return None
+    return {field: organization.get(field) for field in ORGANIZATION_FIELDS if field in organization}
+
+
+def slim_people(people):
+    slim = []
+    for person in people or []:
+        entry = {field: person.get(field) for field in PERSON_FIELDS if field in person}
+        organization = person.get('organization') or {}
+        entry['organization'] = {key: organization[key] for key in ('id', 'name') if key in organization}
+        slim.append(entry)
+    return slim
+
+
+def cache_key(endpoint, domain, filter_type=None, per_page=None):
+    return json.dumps([endpoint, normalize_domain(domain) or str(domain).lower(), filter_type, per_page])
+
+
+class ApolloCache:
+    """(endpoint, domain, filter, page size) -> Apollo answer, with TTL and LRU."""
+
+    def __init__(self, db_name='apollo_cache', ttl_days=None, negative_ttl_days=None, max_entries=None):
+        self.db_name = db_name
+        self.ttl = 86400 * (ttl_days if ttl_days is not None else float(
+            os.environ.get('APOLLO_CACHE_TTL_DAYS', 30)
+        ))
+        self.negative_ttl = 86400 * (negative_ttl_days if negative_ttl_days is not None else float(
+            os.environ.get('APOLLO_CACHE_NEGATIVE_TTL_DAYS', 7)
+        ))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get('APOLLO_CACHE_MAX_ENTRIES', 50000)
+        )
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT, negative INTEGER NOT NULL, '
+                'created_at REAL, expires_at REAL, last_used REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            self._ready.add(id(conn))
+        return conn
+
+    def _count(self, conn, name, amount=1):
+        conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+
+    def get(self, endpoint, domain, filter_type=None, per_page=None):
+        """Cached answer, None or [] for a negative entry, or MISS."""
+        key = cache_key(endpoint, domain, filter_type, per_page)
+        now = time.time()
+        try:
+            conn = self.conn
+            with transaction(conn):
+                row = conn.execute(
+                    'SELECT value, negative, expires_at FROM entries WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and row['expires_at'] <= now:
+                    conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    self._count(conn, 'expired')
+                    row = None
+                if row is None:
+                    self._count(conn, 'misses')
+                    return MISS
+                conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (now, key))
+                self._count(conn, 'negative_hits' if row['negative'] else 'hits')
+        except sqlite3.Error as e:
+            logger.warning(f"Apollo cache lookup failed for {endpoint} {domain}: {e}")
+            return MISS
+        return json.loads(row['value'])
+
+    def set(self, endpoint, domain, value, filter_type=None, per_page=None):
+        """Cache an answer; empty values are stored as negative entries."""
+        key = cache_key(endpoint, domain, filter_type, per_page)
+        negative = not value
+        now = time.time()
+        try:
+            conn = self.conn
+            with transaction(conn):
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, negative, created_at, expires_at, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, json.dumps(value), int(negative), now,
+                     now + (self.negative_ttl if negative else self.ttl), now)
+                )
+                self._count(conn, 'stores')
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not cache Apollo {endpoint} answer for {domain}: {e}")
+
+    def _evict(self, conn):
+        excess = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self._count(conn, 'evictions', excess)
+
+    def clear(self):
+        with transaction(self.conn) as conn:
+            cursor = conn.execute('DELETE FROM entries')
+        return cursor.rowcount
+
+    def stats(self):
+        try:
+            conn = self.conn
+            counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+            sizes = dict(conn.execute('SELECT negative, COUNT(*) FROM entries GROUP BY negative').fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read Apollo cache stats: {e}")
+            return {'available': False}
+
+        result = {name: counters.get(name, 0) for name in COUNTERS}
+        lookups = result['hits'] + result['negative_hits'] + result['misses']
+        result.update({
+            'entries': sizes.get(0, 0) + sizes.get(1, 0),
+            'negative_entries': sizes.get(1, 0),
+            'max_entries': self.max_entries,
+            'hit_rate': round((result['hits'] + result['negative_hits']) / lookups, 4) if lookups else None
+        })
+        return result
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    cache = ApolloCache()
+    if '--clear' in sys.argv[1:]:
+        print(f"Entradas eliminadas: {cache.clear()}")
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,187 @@
+"""
+Persistent index of the Zoho Accounts we know about.
+
+Company names are resolved to Zoho IDs on every scrape, and each new name
+used to cost an equals search plus a contains search against Accounts. The
+index keeps normalized name -> (Zoho ID, domain) in a SQLite table shared by
+all workers and all requests, so repeat companies resolve locally and the
+Zoho search only runs on a miss.
+
+The index is seeded from a paged export of the Accounts module
+(python company_index.py --seed) and grows as companies are found or created.
+Entries pointing at accounts deleted in Zoho are dropped when the ID fails
+verification. Lookups never raise: if the local store is unavailable they
+simply miss and the caller falls back to Zoho.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from local_store import connect, transaction
+from upstream import zoho_crm, zoho_domain
+
+logger = logging.getLogger('job_scraper.company_index')
+
+
+def normalize_company_name(name):
+    """Key used for lookups: case-folded with whitespace collapsed."""
+    return re.sub(r'\s+', ' ', str(name or '')).strip().casefold()
+
+
+def normalize_domain(url):
+    """Bare host of a website URL, without scheme or www."""
+    if not url or not isinstance(url, str):
+        return None
+    domain = re.sub(r'^https?://', '', url.lower().strip())
+    domain = re.sub(r'^www\.', '', domain)
+    domain = domain.split('/')[0].split('?')[0].split('#')[0].strip()
+    return domain if '.' in domain and len(domain) > 3 else None
+
+
+class CompanyIndex:
+    """Normalized company name and domain -> Zoho Account ID, in SQLite."""
+
+    def __init__(self, db_name='company_index'):
+        self.db_name = db_name
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS companies ('
+                'name_key TEXT PRIMARY KEY, name TEXT, domain TEXT, zoho_id TEXT NOT NULL, updated_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS companies_domain ON companies (domain)')
+            conn.execute('CREATE INDEX IF NOT EXISTS companies_zoho_id ON companies (zoho_id)')
+            conn.execute('CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._ready.add(id(conn))
+        return conn
+
+    def lookup(self, company_name):
+        """Zoho ID for a company name, or None if it is not indexed."""
+        key = normalize_company_name(company_name)
+        if not key:
+            return None
+        try:
+            row = self.conn.execute('SELECT zoho_id FROM companies WHERE name_key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Company index lookup failed for '{company_name}': {e}")
+            return None
+        return row['zoho_id'] if row else None
+
+    def lookup_domain(self, domain):
+        """Zoho ID of a company with this website domain, or None."""
+        domain = normalize_domain(domain) or domain
+        if not domain:
+            return None
+        try:
+            row = self.conn.execute(
+                'SELECT zoho_id FROM companies WHERE domain = ? ORDER BY updated_at DESC LIMIT 1', (domain,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Company index lookup failed for domain '{domain}': {e}")
+            return None
+        return row['zoho_id'] if row else None
+
+    def add(self, company_name, zoho_id, website=None):
+        """Record a company found in or created in Zoho."""
+        self.add_many([(company_name, zoho_id, website)])
+
+    def add_many(self, entries):
+        """Record (company_name, zoho_id, website) tuples."""
+        now = time.time()
+        rows = [
+            (normalize_company_name(name), name, normalize_domain(website), str(zoho_id), now)
+            for name, zoho_id, website in entries
+            if normalize_company_name(name) and zoho_id
+        ]
+        if not rows:
+            return
+        try:
+            conn = self.conn
+            with transaction(conn):
+                conn.executemany(
+                    'INSERT INTO companies (name_key, name, domain, zoho_id, updated_at) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(name_key) DO UPDATE SET name = excluded.name, '
+                    'domain = COALESCE(excluded.domain, domain), zoho_id = excluded.zoho_id, '
+                    'updated_at = excluded.updated_at',
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update company index: {e}")
+
+    def remove_id(self, zoho_id):
+        """Forget every name pointing at an account Zoho no longer has."""
+        try:
+            conn = self.conn
+            with transaction(conn):
+                conn.execute('DELETE FROM companies WHERE zoho_id = ?', (str(zoho_id),))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update company index: {e}")
+
+    def seed_from_zoho(self, access_token, module='Accounts'):
+        """Load every account name, website and ID from a paged export."""
+        url = f"{zoho_domain()}/crm/v2/{module}"
+        headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
+        page = 1
+        total = 0
+
+        while True:
+            params = {'page': page, 'per_page': 200, 'fields': 'id,Account_Name,Website'}
+            response = zoho_crm.get(url, headers=headers, params=params)
+            if response.status_code == 204:
+                break
+            if response.status_code != 200:
+                raise Exception(f"Error exporting accounts: {response.status_code} - {response.text}")
+
+            data = response.json()
+            records = data.get('data', [])
+            self.add_many((r.get('Account_Name'), r.get('id'), r.get('Website')) for r in records)
+            total += len(records)
+
+            if not data.get('info', {}).get('more_records', False):
+                break
+            page += 1
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('seeded_at', ?)", (str(time.time()),)
+        )
+        logger.info(f"Company index seeded with {total} accounts from Zoho")
+        return total
+
+    def stats(self):
+        conn = self.conn
+        seeded_at = conn.execute("SELECT value FROM index_meta WHERE key = 'seeded_at'").fetchone()
+        return {
+            'known_companies': conn.execute('SELECT COUNT(*) FROM companies').fetchone()[0],
+            'seeded_at': float(seeded_at['value']) if seeded_at else None
+        }
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+    from zoho_auth import ZohoTokenManager
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('--seed', '--stats'):
+        print("Uso: python3 company_index.py --seed | --stats")
+        sys.exit(1)
+
+    index = CompanyIndex()
+    if sys.argv[1] == '--seed':
+        tokens = ZohoTokenManager(
+            os.environ.get('ZOHO_CLIENT_ID'),
+            os.environ.get('ZOHO_CLIENT_SECRET'),
+            os.environ.get('ZOHO_REFRESH_TOKEN')
+        )
+        zoho_crm.auth = tokens
+        index.seed_from_zoho(tokens.get_token())
+    print(index.stats())
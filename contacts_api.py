@@ -5,17 +5,19 @@ Basado en apollo_contacts_enrichment.py
 """
 
 from flask import Flask, request, jsonify
-import requests
 import json
-import time
 import re
 from datetime import datetime
 from functools import wraps
 import logging
 from logging.handlers import RotatingFileHandler
 import os
-from threading import Lock
-from collections import deque
+
+from upstream import zoho_crm, zoho_domain, apollo, is_throttled, retry_after, UpstreamError, UpstreamThrottled
+from rate_limit import RateLimitExceeded
+from apollo_cache import MISS, ApolloCache, slim_people
+from zoho_auth import ZohoTokenManager
+from zoho_records import find_existing, upsert_records
 
 app = Flask(__name__)
 
@@ -30,6 +32,12 @@ file_handler.setFormatter(logging.Formatter(
 file_handler.setLevel(logging.INFO)
 app.logger.addHandler(file_handler)
 app.logger.setLevel(logging.INFO)
+
+# Shared modules (upstream, ...) log under the job_scraper namespace
+shared_logger = logging.getLogger('job_scraper')
+shared_logger.addHandler(file_handler)
+shared_logger.setLevel(logging.INFO)
+
 app.logger.info('Contacts API startup')
 
 # Load environment variables
@@ -43,22 +51,25 @@ ZOHO_CLIENT_SECRET = os.environ.get('ZOHO_CLIENT_SECRET', 'fcb0113893df4bf97adca
 ZOHO_REFRESH_TOKEN = os.environ.get('ZOHO_REFRESH_TOKEN', '1000.44be0b5623337acfd9706f54076fe99e.388905af35a5badc521cb2f58760487d')
 API_KEY = os.environ.get('API_KEY', 'your-secure-api-key-here')
 
+# Shared across workers through a token cache file (see zoho_auth.py)
+zoho_tokens = ZohoTokenManager(ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_REFRESH_TOKEN)
+# Zoho CRM calls whose token is rejected get a fresh one and are retried once
+zoho_crm.auth = zoho_tokens
+
 # Zoho configuration
-ZOHO_DOMAIN = "https://www.zohoapis.com"
 ACCOUNTS_MODULE = "Accounts"
 CONTACTS_MODULE = "Contacts"
 
-# Apollo rate limiting
-API_CALLS_PER_MINUTE = 200
-API_CALLS_PER_HOUR = 400
-API_CALLS_PER_DAY = 2000
+# "upsert" dedupes contacts on Email in the write itself
+ZOHO_WRITE_MODE = os.environ.get('ZOHO_WRITE_MODE', 'upsert')
 
-api_call_history_minute = deque(maxlen=API_CALLS_PER_MINUTE)
-api_call_history_hour = deque(maxlen=API_CALLS_PER_HOUR)
-api_call_history_day = deque(maxlen=API_CALLS_PER_DAY)
-api_call_lock = Lock()
+# Apollo rate limits (minute/hour/day) are enforced for every worker by the
+# apollo client's sliding-window limiter (see upstream.py and rate_limit.py)
 
 # Statistics
+# Apollo answers per domain, shared with app.py (see apollo_cache.py)
+apollo_cache = ApolloCache()
+
 api_stats = {
     "total_calls": 0,
     "total_contacts_found": 0,
@@ -96,66 +107,22 @@ def require_api_key(f):
     return decorated_function
 
 # Helper functions
-def get_access_token():
-    """Get Zoho access token using refresh token."""
-    url = "https://accounts.zoho.com/oauth/v2/token"
-    data = {
-        'refresh_token': ZOHO_REFRESH_TOKEN,
-        'client_id': ZOHO_CLIENT_ID,
-        'client_secret': ZOHO_CLIENT_SECRET,
-        'grant_type': 'refresh_token'
-    }
-    
-    app.logger.info("Requesting Zoho access token")
-    response = requests.post(url, data=data)
-    
-    if response.status_code == 200:
-        app.logger.info("Access token obtained successfully")
-        return response.json()['access_token']
-    else:
-        error_msg = f"Error getting token: Code {response.status_code}, Response: {response.text}"
-        app.logger.error(error_msg)
-        raise Exception(error_msg)
+def respuesta_limite_apollo(e):
+    """429 response for a call refused by Apollo's rate limits."""
+    retry = int(e.wait) + 1
+    response = jsonify({
+        'success': False,
+        'throttled': True,
+        'error': str(e),
+        'retry_after': retry,
+        'timestamp': datetime.now().isoformat()
+    })
+    response.headers['Retry-After'] = str(retry)
+    return response, 429
 
-def controlar_tasa_api():
-    """Control Apollo API rate limits."""
-    with api_call_lock:
-        current_time = time.time()
-        
-        # Clean old entries
-        minute_ago = current_time - 60
-        hour_ago = current_time - 3600
-        day_ago = current_time - 86400
-        
-        # Clean histories
-        while api_call_history_minute and api_call_history_minute[0] < minute_ago:
-            api_call_history_minute.popleft()
-        while api_call_history_hour and api_call_history_hour[0] < hour_ago:
-            api_call_history_hour.popleft()
-        while api_call_history_day and api_call_history_day[0] < day_ago:
-            api_call_history_day.popleft()
-        
-        # Check limits
-        if len(api_call_history_minute) >= API_CALLS_PER_MINUTE:
-            wait_time = 60 - (current_time - api_call_history_minute[0])
-            app.logger.warning(f"Rate limit per minute reached. Waiting {wait_time:.1f} seconds")
-            time.sleep(wait_time)
-        
-        if len(api_call_history_hour) >= API_CALLS_PER_HOUR:
-            wait_time = 3600 - (current_time - api_call_history_hour[0])
-            app.logger.warning(f"Rate limit per hour reached. Waiting {wait_time:.1f} seconds")
-            time.sleep(wait_time)
-        
-        if len(api_call_history_day) >= API_CALLS_PER_DAY:
-            wait_time = 86400 - (current_time - api_call_history_day[0])
-            app.logger.error(f"Daily rate limit reached. Waiting {wait_time:.1f} seconds")
-            raise Exception("Daily Apollo API limit reached")
-        
-        # Add current call
-        api_call_history_minute.append(current_time)
-        api_call_history_hour.append(current_time)
-        api_call_history_day.append(current_time)
-        api_stats["total_calls"] += 1
+def get_access_token():
+    """Get Zoho access token using refresh token (cached until shortly before expiry)."""
+    return zoho_tokens.get_token()
 
 def obtener_dominio_desde_url(url):
     """Extract domain from URL."""
@@ -185,14 +152,16 @@ def buscar_contactos_apollo(domain, max_contacts=10, filter_type="all"):
         domain: Company domain
         max_contacts: Maximum number of contacts to retrieve
         filter_type: "all", "managers", "executives"
+    
+    Raises RateLimitExceeded when Apollo is throttling us and UpstreamError
+    when the search fails in any other way; only an empty answer to a
+    successful search returns [].
     """
     if not domain:
         return []
     
     app.logger.info(f"Searching Apollo contacts for domain: {domain}, filter: {filter_type}")
     
-    controlar_tasa_api()
-    
     url = "https://api.apollo.io/api/v1/mixed_people/search"
     
     headers = {
@@ -220,56 +189,63 @@ def buscar_contactos_apollo(domain, max_contacts=10, filter_type="all"):
         ]
         payload["include_similar_titles"] = True
     
+    # This search only returns contacts with an email status, so its answers
+    # are cached apart from app.py's
+    endpoint = 'mixed_people/search:email_status'
+    
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        apollo_contacts = apollo_cache.get(endpoint, domain, filter_type, max_contacts)
+        if apollo_contacts is MISS:
+            api_stats["total_calls"] += 1
+            response = apollo.post(url, headers=headers, json=payload)
+            
+            if is_throttled(response):
+                app.logger.warning("Apollo API rate limit exceeded")
+                raise UpstreamThrottled('apollo', retry_after(response, 60))
+            if response.status_code != 200:
+                app.logger.error(f"Apollo API error: {response.status_code}")
+                raise UpstreamError('apollo', f"{response.status_code} - {response.text}")
+            
+            apollo_contacts = slim_people(response.json().get('people', []))
+            apollo_cache.set(endpoint, domain, apollo_contacts, filter_type, max_contacts)
+        else:
+            app.logger.info(f"Apollo people for {domain} served from cache ({len(apollo_contacts)} people)")
         
-        if response.status_code == 200:
-            data = response.json()
-            apollo_contacts = data.get('people', [])
+        valid_contacts = []
+        for person in apollo_contacts:
+            email = person.get('email')
             
-            valid_contacts = []
-            for person in apollo_contacts:
-                email = person.get('email')
-                
-                if not email or not person.get('first_name') or not person.get('last_name'):
-                    continue
-                
-                if "email_not_unlocked@" in email:
-                    continue
-                
-                organization = person.get('organization', {}) or {}
-                
-                contact_data = {
-                    "apollo_id": person.get('id'),
-                    "first_name": person.get('first_name'),
-                    "last_name": person.get('last_name'),
-                    "email": email,
-                    "title": person.get('title'),
-                    "seniority": person.get('seniority'),
-                    "phone": person.get('phone'),
-                    "linkedin_url": person.get('linkedin_url'),
-                    "organization_name": organization.get('name', 'N/A'),
-                    "organization_id": organization.get('id'),
-                    "departments": person.get('departments', []),
-                    "city": person.get('city'),
-                    "state": person.get('state'),
-                    "country": person.get('country'),
-                    "apollo_person_url": f"https://app.apollo.io/#/people/{person.get('id')}" if person.get('id') else None
-                }
-                
-                valid_contacts.append(contact_data)
+            if not email or not person.get('first_name') or not person.get('last_name'):
+                continue
             
-            api_stats["total_contacts_found"] += len(valid_contacts)
-            return valid_contacts
+            if "email_not_unlocked@" in email:
+                continue
             
-        elif response.status_code == 429:
-            app.logger.warning(f"Apollo API rate limit exceeded")
-            raise Exception("Apollo API rate limit exceeded")
-        else:
-            app.logger.error(f"Apollo API error: {response.status_code}")
-            api_stats["total_errors"] += 1
-            return []
+            organization = person.get('organization', {}) or {}
             
+            contact_data = {
+                "apollo_id": person.get('id'),
+                "first_name": person.get('first_name'),
+                "last_name": person.get('last_name'),
+                "email": email,
+                "title": person.get('title'),
+                "seniority": person.get('seniority'),
+                "phone": person.get('phone'),
+                "linkedin_url": person.get('linkedin_url'),
+                "organization_name": organization.get('name', 'N/A'),
+                "organization_id": organization.get('id'),
+                "departments": person.get('departments', []),
+                "city": person.get('city'),
+                "state": person.get('state'),
+                "country": person.get('country'),
+                "apollo_person_url": f"https://app.apollo.io/#/people/{person.get('id')}" if person.get('id') else None
+            }
+            
+            valid_contacts.append(contact_data)
+        
+        api_stats["total_contacts_found"] += len(valid_contacts)
+        return valid_contacts
+        
     except Exception as e:
         app.logger.error(f"Exception searching Apollo contacts: {e}")
         api_stats["total_errors"] += 1
@@ -280,7 +256,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id):
     if not email:
         return False
     
-    url = f"{ZOHO_DOMAIN}/crm/v2/{CONTACTS_MODULE}/search"
+    url = f"{zoho_domain()}/crm/v2/{CONTACTS_MODULE}/search"
     headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
     
     params = {
@@ -289,7 +265,7 @@ def verificar_contacto_existe_zoho(access_token, email, account_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = zoho_crm.get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             contacts = data.get('data', [])
@@ -307,38 +283,40 @@ def verificar_contacto_existe_zoho(access_token, email, account_id):
     
     return False
 
+def construir_registro_contacto(contact_data, account_id):
+    """Build the Zoho Contacts record for an Apollo contact."""
+    record = {
+        "First_Name": contact_data['first_name'],
+        "Last_Name": contact_data['last_name'],
+        "Email": contact_data['email'],
+        "Account_Name": {"id": account_id},
+        "Title": contact_data.get('title'),
+        "Phone": contact_data.get('phone'),
+        "LinkedIn": contact_data.get('linkedin_url'),
+        "Mailing_City": contact_data.get('city'),
+        "Mailing_State": contact_data.get('state'),
+        "Mailing_Country": contact_data.get('country'),
+        "Department": ', '.join(contact_data.get('departments', [])) if contact_data.get('departments') else None,
+        "Lead_Source": "Apollo.io",
+        "Apollo_ID": contact_data.get('apollo_id'),
+        "Apollo_URL": contact_data.get('apollo_person_url')
+    }
+    
+    # Remove None values
+    return {k: v for k, v in record.items() if v is not None}
+
 def crear_contacto_zoho(access_token, contact_data, account_id):
     """Create contact in Zoho CRM."""
-    url = f"{ZOHO_DOMAIN}/crm/v2/{CONTACTS_MODULE}"
+    url = f"{zoho_domain()}/crm/v2/{CONTACTS_MODULE}"
     headers = {
         'Authorization': f'Zoho-oauthtoken {access_token}',
         'Content-Type': 'application/json'
     }
     
-    zoho_contact = {
-        "data": [{
-            "First_Name": contact_data['first_name'],
-            "Last_Name": contact_data['last_name'],
-            "Email": contact_data['email'],
-            "Account_Name": {"id": account_id},
-            "Title": contact_data.get('title'),
-            "Phone": contact_data.get('phone'),
-            "LinkedIn": contact_data.get('linkedin_url'),
-            "Mailing_City": contact_data.get('city'),
-            "Mailing_State": contact_data.get('state'),
-            "Mailing_Country": contact_data.get('country'),
-            "Department": ', '.join(contact_data.get('departments', [])) if contact_data.get('departments') else None,
-            "Lead_Source": "Apollo.io",
-            "Apollo_ID": contact_data.get('apollo_id'),
-            "Apollo_URL": contact_data.get('apollo_person_url')
-        }]
-    }
-    
-    # Remove None values
-    zoho_contact["data"][0] = {k: v for k, v in zoho_contact["data"][0].items() if v is not None}
+    zoho_contact = {"data": [construir_registro_contacto(contact_data, account_id)]}
     
     try:
-        response = requests.post(url, headers=headers, json=zoho_contact)
+        response = zoho_crm.post(url, headers=headers, json=zoho_contact)
         
         if response.status_code == 201:
             result = response.json()
@@ -379,17 +357,13 @@ def health():
 @require_api_key
 def stats():
     """Get API usage statistics."""
+    # Shared by all workers, so these are server-wide counts
+    apollo_usage = apollo.limiter.usage()
     return jsonify({
         'apollo_api': {
             'total_calls': api_stats['total_calls'],
-            'minute_usage': len(api_call_history_minute),
-            'hour_usage': len(api_call_history_hour),
-            'day_usage': len(api_call_history_day),
-            'limits': {
-                'per_minute': API_CALLS_PER_MINUTE,
-                'per_hour': API_CALLS_PER_HOUR,
-                'per_day': API_CALLS_PER_DAY
-            }
+            **{f'{tier}_usage': window['used'] for tier, window in apollo_usage.items()},
+            'limits': {f'per_{tier}': window['limit'] for tier, window in apollo_usage.items()}
         },
         'contacts': {
             'total_found': api_stats['total_contacts_found'],
@@ -397,6 +371,7 @@ def stats():
             'total_duplicated': api_stats['total_contacts_duplicated']
         },
         'errors': api_stats['total_errors'],
+        'apollo_cache': apollo_cache.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -440,6 +415,9 @@ def search_contacts():
             'timestamp': datetime.now().isoformat()
         })
         
+    except RateLimitExceeded as e:
+        app.logger.warning(f"Apollo throttled search_contacts: {e}")
+        return respuesta_limite_apollo(e)
     except Exception as e:
         app.logger.error(f"Error in search_contacts: {e}")
         return jsonify({
@@ -506,17 +484,55 @@ def enrich_company():
         
         # Create contacts in Zoho
         created_count = 0
+        updated_count = 0
         skipped_count = 0
         errors = []
         
+        existentes = None
+        if skip_duplicates and ZOHO_WRITE_MODE == 'upsert':
+            # Contacts already in Zoho are left alone: upserting them would
+            # overwrite them and move them to this company
+            try:
+                existentes = find_existing(access_token, CONTACTS_MODULE, 'Email', [c['email'] for c in contacts])
+            except Exception as e:
+                app.logger.warning(f"Could not look up contacts in bulk, searching one by one: {e}")
+        
+        upserts = []
+        contacts_to_create = []
         for contact in contacts:
+            email = contact.get('email')
+            if existentes is not None and email:
+                duplicado = email.lower() in existentes
+            elif skip_duplicates:
+                duplicado = verificar_contacto_existe_zoho(access_token, email, company_id)
+            else:
+                duplicado = False
+            
+            if duplicado:
+                skipped_count += 1
+                app.logger.info(f"Skipped duplicate contact: {email}")
+            elif ZOHO_WRITE_MODE == 'upsert' and email:
+                upserts.append(contact)
+            else:
+                contacts_to_create.append(contact)
+        
+        if upserts:
+            # One upsert deduplicated on Email replaces a search per contact
+            registros = [construir_registro_contacto(contact, company_id) for contact in upserts]
+            respuestas = upsert_records(access_token, CONTACTS_MODULE, registros, ['Email'])
+            for contact, respuesta in zip(upserts, respuestas):
+                if not respuesta['success']:
+                    errors.append(f"Failed to create contact: {contact['email']} ({respuesta['code']} - {respuesta['message']})")
+                    api_stats["total_errors"] += 1
+                elif respuesta['action'] == 'update':
+                    updated_count += 1
+                    api_stats["total_contacts_duplicated"] += 1
+                else:
+                    created_count += 1
+                    api_stats["total_contacts_created"] += 1
+        
+        for contact in contacts_to_create:
             try:
-                # Check if contact already exists
-                if skip_duplicates and verificar_contacto_existe_zoho(access_token, contact['email'], company_id):
-                    skipped_count += 1
-                    app.logger.info(f"Skipped duplicate contact: {contact['email']}")
-                    continue
-                
                 # Create contact
                 contact_id = crear_contacto_zoho(access_token, contact, company_id)
                 if contact_id:
@@ -539,6 +555,7 @@ def enrich_company():
             'summary': {
                 'contacts_found': len(contacts),
                 'contacts_created': created_count,
+                'contacts_updated': updated_count,
                 'contacts_skipped': skipped_count,
                 'errors': len(errors)
             },
@@ -550,6 +567,9 @@ def enrich_company():
         
         return jsonify(result)
         
+    except RateLimitExceeded as e:
+        app.logger.warning(f"Apollo throttled enrich_company: {e}")
+        return respuesta_limite_apollo(e)
     except Exception as e:
         app.logger.error(f"Error in enrich_company: {e}")
         return jsonify({
@@ -39,7 +39,7 @@ class DailyEnrichmentProcessor:
         self.total_contacts = 0
         self.start_time = time.time()
         
-    def process_chunk(self, offset):
+    def process_chunk(self, offset, cursor=None):
         """Process a single chunk of companies"""
         for attempt in range(MAX_RETRIES):
             try:
@@ -53,7 +53,8 @@ class DailyEnrichmentProcessor:
                         "start_offset": offset,
                         "contacts_per_company": CONTACTS_PER_COMPANY,
                         "filter_type": FILTER_TYPE,
-                        "session_id": self.session_id
+                        "session_id": self.session_id,
+                        "cursor": cursor
                     },
                     timeout=240  # 4-minute timeout per chunk
                 )
@@ -77,11 +78,12 @@ class DailyEnrichmentProcessor:
         """Run the daily enrichment process"""
         logging.info(f"Starting daily enrichment - Session: {self.session_id}")
         offset = 0
+        cursor = None
         consecutive_failures = 0
         
         while True:
             # Process chunk
-            result = self.process_chunk(offset)
+            result = self.process_chunk(offset, cursor)
             
             if not result:
                 consecutive_failures += 1
@@ -117,9 +119,15 @@ class DailyEnrichmentProcessor:
             
             # Update offset for next chunk
             offset = chunk_info.get('next_offset', offset + CHUNK_SIZE)
+            cursor = chunk_info.get('next_cursor')
             
-            # Small delay between chunks
-            time.sleep(1)
+            # Small delay between chunks, or Apollo's wait if it throttled this one
+            if chunk_info.get('throttled'):
+                wait = chunk_info.get('retry_after') or 60
+                logging.warning(f"Apollo rate limit reached, resuming in {wait}s")
+                time.sleep(wait)
+            else:
+                time.sleep(1)
         
         self.print_summary()
     
@@ -0,0 +1,85 @@
+"""
+Opaque pagination cursors for the chunked enrichment endpoints.
+
+A cursor carries the keyset position (the last Account id handed out) plus
+running progress counters, encoded as URL-safe base64 so clients treat it as
+an opaque token and simply send back the next_cursor they were given. Unlike
+offsets, a keyset position does not shift when enriched companies drop out of
+the "without contacts" set between chunks.
+
+Where a local disk is available the latest cursor of each session_id is also
+stored (see CursorStore), so a client that only resends its session_id
+resumes where the previous chunk stopped.
+"""
+
+import base64
+import json
+import logging
+import sqlite3
+import time
+
+from local_store import connect
+
+logger = logging.getLogger('job_scraper.enrichment_cursors')
+
+
+def encode_cursor(state):
+    """Encode a cursor state dict as an opaque token."""
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor; raises ValueError if it is invalid."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+class CursorStore:
+    """Latest cursor per session_id, shared by the gunicorn workers."""
+
+    def __init__(self, db_name='enrichment_cursors', max_age_days=7):
+        self.db_name = db_name
+        self.max_age = max_age_days * 86400
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cursors ('
+                'session_id TEXT PRIMARY KEY, cursor TEXT NOT NULL, updated_at REAL)'
+            )
+            self._ready.add(id(conn))
+        return conn
+
+    def get(self, session_id):
+        """Cursor token last saved for session_id, or None."""
+        try:
+            row = self.conn.execute(
+                'SELECT cursor FROM cursors WHERE session_id = ? AND updated_at > ?',
+                (session_id, time.time() - self.max_age)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read cursor for session {session_id}: {e}")
+            return None
+        return row['cursor'] if row else None
+
+    def save(self, session_id, cursor):
+        try:
+            conn = self.conn
+            conn.execute(
+                'INSERT OR REPLACE INTO cursors (session_id, cursor, updated_at) VALUES (?, ?, ?)',
+                (session_id, cursor, time.time())
+            )
+            # Old sessions are never resumed; keep the table small
+            conn.execute('DELETE FROM cursors WHERE updated_at < ?', (time.time() - self.max_age,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save cursor for session {session_id}: {e}")
@@ -0,0 +1,122 @@
+"""
+Accounts waiting for Apollo organization enrichment.
+
+New companies are created in Zoho straight from the Indeed data, so the
+scrape only waits on Zoho. Their domains are queued here, and a background
+stage later enriches them with Apollo and fills in the Account fields. The
+queue lives in SQLite, shared by every worker and kept across restarts.
+
+Entries are claimed before they are worked on, so two workers draining the
+queue never enrich the same company. A claim not completed or released
+within ENRICHMENT_CLAIM_TIMEOUT seconds (default 600), e.g. because its
+worker died, is picked up again. Entries that fail
+ENRICHMENT_MAX_ATTEMPTS times (default 5) are dropped.
+
+    python enrichment_queue.py    show pending and claimed counts
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from local_store import connect, transaction
+
+logger = logging.getLogger('job_scraper.enrichment_queue')
+
+
+class EnrichmentQueue:
+    """Zoho Account ID -> domain still to enrich, with claims and retries."""
+
+    def __init__(self, db_name='enrichment_queue', max_attempts=None, claim_timeout=None):
+        self.db_name = db_name
+        self.max_attempts = max_attempts if max_attempts is not None else int(
+            os.environ.get('ENRICHMENT_MAX_ATTEMPTS', 5)
+        )
+        self.claim_timeout = claim_timeout if claim_timeout is not None else float(
+            os.environ.get('ENRICHMENT_CLAIM_TIMEOUT', 600)
+        )
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pending ('
+                'company_id TEXT PRIMARY KEY, domain TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'queued_at REAL, claimed_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pending_queued_at ON pending (queued_at)')
+            self._ready.add(id(conn))
+        return conn
+
+    def add_many(self, entries):
+        """Queue (company_id, domain) pairs; returns how many were queued."""
+        now = time.time()
+        rows = [(str(company_id), domain, now) for company_id, domain in entries if company_id and domain]
+        if not rows:
+            return 0
+        try:
+            with transaction(self.conn) as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO pending (company_id, domain, queued_at) VALUES (?, ?, ?)', rows
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not queue {len(rows)} companies for enrichment: {e}")
+            return 0
+        return len(rows)
+
+    def add(self, company_id, domain):
+        return self.add_many([(company_id, domain)])
+
+    def claim(self, limit=100):
+        """Claim up to limit entries, oldest first, as (company_id, domain) pairs."""
+        now = time.time()
+        with transaction(self.conn) as conn:
+            rows = conn.execute(
+                'SELECT company_id, domain FROM pending WHERE claimed_at IS NULL OR claimed_at < ? '
+                'ORDER BY queued_at LIMIT ?',
+                (now - self.claim_timeout, int(limit))
+            ).fetchall()
+            conn.executemany(
+                'UPDATE pending SET claimed_at = ?, attempts = attempts + 1 WHERE company_id = ?',
+                [(now, row['company_id']) for row in rows]
+            )
+        return [(row['company_id'], row['domain']) for row in rows]
+
+    def complete(self, company_ids):
+        """Drop entries that were enriched, or that Apollo does not know."""
+        with transaction(self.conn) as conn:
+            conn.executemany('DELETE FROM pending WHERE company_id = ?', [(str(i),) for i in company_ids])
+
+    def release(self, company_ids):
+        """Return claimed entries to the queue, dropping those out of attempts."""
+        ids = [(str(i),) for i in company_ids]
+        with transaction(self.conn) as conn:
+            conn.executemany('UPDATE pending SET claimed_at = NULL WHERE company_id = ?', ids)
+            dropped = conn.execute(
+                'DELETE FROM pending WHERE claimed_at IS NULL AND attempts >= ?', (self.max_attempts,)
+            ).rowcount
+        if dropped:
+            logger.warning(f"Dropped {dropped} companies from the enrichment queue after {self.max_attempts} attempts")
+
+    def stats(self):
+        try:
+            row = self.conn.execute(
+                'SELECT COUNT(*) AS pending, COUNT(claimed_at) AS claimed, MIN(queued_at) AS oldest FROM pending'
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read enrichment queue stats: {e}")
+            return {'available': False}
+        return {
+            'pending': row['pending'],
+            'claimed': row['claimed'],
+            'oldest_age_seconds': round(time.time() - row['oldest']) if row['oldest'] else None
+        }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(EnrichmentQueue().stats(), indent=2))
@@ -0,0 +1,229 @@
+"""
+Local index of the Indeed job IDs already written to Zoho.
+
+Recurring scrapes mostly return jobs we inserted on a previous run. The
+index keeps every ID_Indeed we have written in a SQLite table shared by all
+workers, so known jobs are skipped with no network call at all. Each process
+also keeps a Bloom filter in front of the table: a miss in the filter means
+the ID is definitely new and the table is not touched; only filter hits are
+confirmed against the exact set.
+
+The index is seeded once from a full export of the Jobs module
+(python job_index.py --seed) and updated after every insert. When it has not
+been seeded, or the last seed is older than JOB_INDEX_MAX_AGE_DAYS, it is
+marked stale and hits should be double-checked with Zoho before skipping.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+from local_store import connect, transaction
+from upstream import zoho_crm, zoho_domain
+
+logger = logging.getLogger('job_scraper.job_index')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1024)
+        self.size = int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class JobIndex:
+    """Exact set of known Indeed IDs in SQLite, fronted by a Bloom filter."""
+
+    def __init__(self, db_name='job_index', max_age_days=None):
+        self.db_name = db_name
+        self.max_age = 86400 * (max_age_days if max_age_days is not None else float(
+            os.environ.get('JOB_INDEX_MAX_AGE_DAYS', 7)
+        ))
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_rowid = 0
+        self._pid = None
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS known_jobs ('
+                'indeed_id TEXT PRIMARY KEY, zoho_id TEXT, added_at REAL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._ready.add(id(conn))
+        return conn
+
+    def _sync_bloom(self):
+        # Pull in IDs other workers added since the last look, so a filter
+        # miss really means the ID is not in the shared table
+        with self._lock:
+            if self._pid != os.getpid():
+                self._bloom = None
+                self._pid = os.getpid()
+            if self._bloom is not None and self._bloom.count > self._bloom.capacity:
+                # Past capacity the false-positive rate climbs; rebuild bigger
+                self._bloom = None
+
+            conn = self.conn
+            if self._bloom is None:
+                total = conn.execute('SELECT COUNT(*) FROM known_jobs').fetchone()[0]
+                self._bloom = BloomFilter(total * 2)
+                self._last_rowid = 0
+
+            rows = conn.execute(
+                'SELECT rowid, indeed_id FROM known_jobs WHERE rowid > ? ORDER BY rowid',
+                (self._last_rowid,)
+            ).fetchall()
+            for row in rows:
+                self._bloom.add(row['indeed_id'])
+                self._last_rowid = row['rowid']
+
+    def known(self, indeed_ids):
+        """Return the subset of indeed_ids already in the index."""
+        self._sync_bloom()
+        candidates = [str(i) for i in indeed_ids if str(i) in self._bloom]
+        if not candidates:
+            return set()
+
+        found = set()
+        conn = self.conn
+        for start in range(0, len(candidates), 500):
+            chunk = candidates[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT indeed_id FROM known_jobs WHERE indeed_id IN ({placeholders})', chunk
+            ).fetchall()
+            found.update(row['indeed_id'] for row in rows)
+        return found
+
+    def __contains__(self, indeed_id):
+        return bool(self.known([indeed_id]))
+
+    def add(self, entries):
+        """Record (indeed_id, zoho_id) pairs as written to Zoho."""
+        entries = [(str(indeed_id), zoho_id, time.time()) for indeed_id, zoho_id in entries if indeed_id]
+        if not entries:
+            return
+        conn = self.conn
+        with transaction(conn):
+            conn.executemany(
+                'INSERT INTO known_jobs (indeed_id, zoho_id, added_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(indeed_id) DO UPDATE SET zoho_id = COALESCE(excluded.zoho_id, zoho_id)',
+                entries
+            )
+
+    def remove(self, indeed_ids):
+        """Forget IDs, e.g. jobs Zoho no longer has."""
+        # Stale bits left in the Bloom filters only cost an extra table lookup
+        conn = self.conn
+        with transaction(conn):
+            conn.executemany('DELETE FROM known_jobs WHERE indeed_id = ?', [(str(i),) for i in indeed_ids])
+
+    def _meta(self, key):
+        row = self.conn.execute('SELECT value FROM index_meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def is_stale(self):
+        """True if the index may be missing jobs or holding deleted ones."""
+        if self._meta('stale') == '1':
+            return True
+        seeded_at = self._meta('seeded_at')
+        return seeded_at is None or time.time() - float(seeded_at) > self.max_age
+
+    def mark_stale(self, stale=True):
+        conn = self.conn
+        conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('stale', ?)", ('1' if stale else '0',)
+        )
+
+    def mark_seeded(self):
+        conn = self.conn
+        with transaction(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('seeded_at', ?)", (str(time.time()),)
+            )
+            conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('stale', '0')")
+
+    def seed_from_zoho(self, access_token, jobs_module='Jobs'):
+        """Load every ID_Indeed from a full export of the Jobs module."""
+        url = f"{zoho_domain()}/crm/v2/{jobs_module}"
+        headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
+        page = 1
+        total = 0
+
+        while True:
+            params = {'page': page, 'per_page': 200, 'fields': 'id,ID_Indeed'}
+            response = zoho_crm.get(url, headers=headers, params=params)
+            if response.status_code == 204:
+                break
+            if response.status_code != 200:
+                raise Exception(f"Error exporting jobs: {response.status_code} - {response.text}")
+
+            data = response.json()
+            records = data.get('data', [])
+            self.add((r.get('ID_Indeed'), r.get('id')) for r in records)
+            total += len(records)
+
+            if not data.get('info', {}).get('more_records', False):
+                break
+            page += 1
+
+        self.mark_seeded()
+        logger.info(f"Job index seeded with {total} jobs from Zoho")
+        return total
+
+    def stats(self):
+        conn = self.conn
+        return {
+            'known_jobs': conn.execute('SELECT COUNT(*) FROM known_jobs').fetchone()[0],
+            'stale': self.is_stale()
+        }
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+    from zoho_auth import ZohoTokenManager
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('--seed', '--stats'):
+        print("Uso: python3 job_index.py --seed | --stats")
+        sys.exit(1)
+
+    index = JobIndex()
+    if sys.argv[1] == '--seed':
+        tokens = ZohoTokenManager(
+            os.environ.get('ZOHO_CLIENT_ID'),
+            os.environ.get('ZOHO_CLIENT_SECRET'),
+            os.environ.get('ZOHO_REFRESH_TOKEN')
+        )
+        zoho_crm.auth = tokens
+        index.seed_from_zoho(tokens.get_token())
+    print(index.stats())
@@ -0,0 +1,142 @@
+"""
+Status of background scrape jobs, shared by every gunicorn worker.
+
+Jobs used to live in a dict inside whichever worker queued them, so a status
+poll routed to any other worker found nothing, and finished jobs were never
+dropped. The store keeps one row per job in SQLite (WAL, see local_store.py).
+Lookups are by primary key, pending jobs are counted through an index on
+status, and progress updates merge fields inside a write transaction, so
+concurrent writers never lose each other's fields.
+
+Finished jobs are purged JOB_STATUS_TTL_HOURS after they end (default 24).
+A job left queued or processing by a worker that has since exited is
+reported as an error instead of pending forever.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from local_store import connect, transaction
+
+logger = logging.getLogger('job_scraper.job_store')
+
+PENDING_STATUSES = ('queued', 'processing')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Job id -> status dict, in SQLite with TTL eviction of finished jobs."""
+
+    def __init__(self, db_name='jobs', ttl_hours=None):
+        self.db_name = db_name
+        self.ttl = 3600 * (ttl_hours if ttl_hours is not None else float(
+            os.environ.get('JOB_STATUS_TTL_HOURS', 24)
+        ))
+        self._ready = set()
+        self._last_purge = 0
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, '
+                'owner_pid INTEGER, created_at REAL, updated_at REAL, finished_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)')
+            self._ready.add(id(conn))
+        return conn
+
+    def create(self, job_id, status='queued', **fields):
+        """Register a new job owned by this process."""
+        now = time.time()
+        data = dict(fields, status=status)
+        conn = self.conn
+        conn.execute(
+            'INSERT INTO jobs (id, status, data, owner_pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, status, json.dumps(data), os.getpid(), now, now)
+        )
+        self.purge_expired()
+        return data
+
+    def update(self, job_id, **fields):
+        """Merge fields into a job's status; 'status' moves it between states."""
+        now = time.time()
+        conn = self.conn
+        with transaction(conn):
+            row = conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                logger.warning(f"Update for unknown job {job_id}: {list(fields)}")
+                return None
+            data = json.loads(row['data'])
+            data.update(fields)
+            status = data.get('status', 'queued')
+            conn.execute(
+                'UPDATE jobs SET status = ?, data = ?, updated_at = ?, owner_pid = ?, '
+                'finished_at = CASE WHEN ? THEN COALESCE(finished_at, ?) ELSE NULL END WHERE id = ?',
+                (status, json.dumps(data), now, os.getpid(), status not in PENDING_STATUSES, now, job_id)
+            )
+        return data
+
+    def get(self, job_id):
+        """Status dict of a job, or None if it is unknown or expired."""
+        self.purge_expired()
+        row = self.conn.execute(
+            'SELECT data, status, owner_pid FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row['status'] in PENDING_STATUSES and row['owner_pid'] and not _pid_alive(row['owner_pid']):
+            return self.update(job_id, status='error', error='Worker exited before the job finished')
+        return json.loads(row['data'])
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def count(self, statuses=PENDING_STATUSES):
+        self.reap_orphans()
+        placeholders = ','.join('?' * len(statuses))
+        return self.conn.execute(
+            f'SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})', tuple(statuses)
+        ).fetchone()[0]
+
+    def reap_orphans(self):
+        """Fail pending jobs whose worker process no longer exists."""
+        placeholders = ','.join('?' * len(PENDING_STATUSES))
+        rows = self.conn.execute(
+            f'SELECT id, owner_pid FROM jobs WHERE status IN ({placeholders})', PENDING_STATUSES
+        ).fetchall()
+        for row in rows:
+            if row['owner_pid'] and not _pid_alive(row['owner_pid']):
+                self.update(row['id'], status='error', error='Worker exited before the job finished')
+
+    def purge_expired(self, force=False):
+        """Delete finished jobs older than the TTL; runs at most once a minute."""
+        now = time.time()
+        if not force and now - self._last_purge < 60:
+            return 0
+        self._last_purge = now
+        try:
+            cursor = self.conn.execute(
+                'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (now - self.ttl,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not purge expired jobs: {e}")
+            return 0
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} finished jobs")
+        return cursor.rowcount
@@ -0,0 +1,62 @@
+"""
+Local SQLite storage shared by the gunicorn workers.
+
+Every store (job index, company index, ...) lives in its own database file
+under DATA_DIR. Connections are opened per thread and per process, in WAL
+mode so readers never block the single writer, with a busy timeout so
+concurrent writers from other workers wait instead of failing.
+"""
+
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def data_path(filename):
+    """Absolute path of a file in the local data directory."""
+    # Read on each call so a DATA_DIR loaded from .env after import still applies
+    path = os.path.abspath(os.path.join(os.environ.get('DATA_DIR', 'data'), filename))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def connect(name):
+    """Return this thread's connection to the named database."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None or getattr(_local, 'pid', None) != os.getpid():
+        # Never reuse a connection inherited across fork
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = connections.get(name)
+    if conn is None:
+        conn = sqlite3.connect(data_path(f"{name}.db"), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        connections[name] = conn
+    return conn
+
+
+class transaction:
+    """Run a block inside BEGIN IMMEDIATE ... COMMIT on a connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+    sequences are atomic across threads and workers.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
@@ -0,0 +1,110 @@
+"""
+Staged producer/consumer pipeline with bounded queues.
+
+A scrape used to run its steps one after another over the whole result:
+prepare every row, resolve every company, then write every job. A Pipeline
+runs them as stages instead, each on its own threads and joined by queues
+of at most PIPELINE_QUEUE_SIZE items (default 4). A stage starts on the
+first item as soon as the stage before hands it over. A slow stage makes
+the ones upstream wait rather than pile up items in memory.
+
+Stages are functions of one item that return the item for the next stage,
+or None to drop it. What the last stage returns is discarded, so stages
+keep their own results. The first error a stage or the source raises stops
+the run: items still queued are dropped, running stages finish their
+current item, and run() raises the error once every thread has exited.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger('job_scraper.pipeline')
+
+# Tells a stage worker there are no more items
+_DONE = object()
+
+
+class Pipeline:
+    """Stages joined by bounded queues, each stage run by its own threads."""
+
+    def __init__(self, name='pipeline', queue_size=None):
+        self.name = name
+        self.queue_size = queue_size if queue_size is not None else int(
+            os.environ.get('PIPELINE_QUEUE_SIZE', 4)
+        )
+        self.stages = []
+
+    def stage(self, name, func, workers=1):
+        """Add a stage after the existing ones, run by workers threads."""
+        self.stages.append((name, func, max(1, int(workers))))
+
+    def run(self, items):
+        """Feed items through every stage, returning once all are processed."""
+        queues = [queue.Queue(maxsize=max(1, self.queue_size)) for _ in self.stages]
+        self._errors = []
+        self._stop = threading.Event()
+
+        threads = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            has_next = index + 1 < len(self.stages)
+            outbox = queues[index + 1] if has_next else None
+            next_workers = self.stages[index + 1][2] if has_next else 0
+            remaining = {'count': workers, 'lock': threading.Lock()}
+            for n in range(workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(name, func, queues[index], outbox, next_workers, remaining),
+                    name=f"{self.name}-{name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # The calling thread is the source stage
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    break
+                queues[0].put(item)
+        except Exception as e:
+            logger.error(f"{self.name}: source failed: {e}")
+            self._fail(e)
+        finally:
+            for _ in range(self.stages[0][2]):
+                queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _fail(self, error):
+        self._errors.append(error)
+        self._stop.set()
+
+    def _worker(self, name, func, inbox, outbox, next_workers, remaining):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            # After a failure keep draining, so upstream is never blocked on a full queue
+            if self._stop.is_set():
+                continue
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error(f"{self.name}: stage {name} failed: {e}")
+                self._fail(e)
+                continue
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+        # The last worker of a stage to finish closes the next one
+        with remaining['lock']:
+            remaining['count'] -= 1
+            last = remaining['count'] == 0
+        if last and outbox is not None:
+            for _ in range(next_workers):
+                outbox.put(_DONE)
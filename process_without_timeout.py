@@ -19,6 +19,7 @@ DELAY_BETWEEN_BATCHES = 2  # Segundos entre batches
 def process_all_companies():
     """Procesa todas las empresas en mini batches"""
     offset = 0
+    cursor = None
     total_processed = 0
     total_enriched = 0
     total_contacts = 0
@@ -42,7 +43,8 @@ def process_all_companies():
                 },
                 json={
                     "batch_size": BATCH_SIZE,
-                    "start_offset": offset
+                    "start_offset": offset,
+                    "cursor": cursor
                 },
                 timeout=120  # 2 minutos de timeout
             )
@@ -82,8 +84,14 @@ def process_all_companies():
             
             # Actualizar offset
             offset = batch_info.get('next_offset', offset + BATCH_SIZE)
+            cursor = batch_info.get('next_cursor')
             
-            # Pausa entre batches
+            # Pausa entre batches (la que pida Apollo si limitó este batch)
+            if batch_info.get('throttled'):
+                espera = batch_info.get('retry_after') or 60
+                print(f"⏳ Límite de Apollo alcanzado, reanudando en {espera} segundos...\n")
+                time.sleep(espera)
+                continue
             print(f"⏳ Esperando {DELAY_BETWEEN_BATCHES} segundos antes del siguiente batch...\n")
             time.sleep(DELAY_BETWEEN_BATCHES)
             
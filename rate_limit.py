@@ -0,0 +1,315 @@
+"""
+Rate limiters shared by every gunicorn worker.
+
+Limiter state lives in SQLite (see local_store.py), so the configured
+limits hold for the whole server rather than per process. Callers reserve
+capacity inside a short write transaction and, if none is free, sleep
+outside it for exactly as long as it takes to free up. Nobody waits while
+capacity is available, and nobody sleeps while holding a lock.
+
+- TokenBucket paces Zoho at a steady rate with bursts:
+
+    RATE_LIMIT_<NAME>          tokens per second (0 disables the bucket)
+    RATE_LIMIT_<NAME>_BURST    bucket size, i.e. calls allowed back to back
+
+  where <NAME> is ZOHO_CRM or ZOHO_ACCOUNTS.
+
+- SlidingWindowLimiter enforces Apollo's minute, hour and day quotas
+  (APOLLO_SEARCH, APOLLO_ENRICH); see its docstring for the variables.
+
+Either kind can also be paused for everyone with pause(), e.g. when an
+upstream answers 429 with a Retry-After or reports its quota nearly spent
+(see upstream.py).
+
+Settings are read on first use. If the local store cannot be opened (e.g. a
+read-only filesystem) a limiter falls back to limiting this process only.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from local_store import connect, transaction
+
+logger = logging.getLogger('job_scraper.rate_limit')
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class _Pausable:
+    """Shared "nobody calls before" timestamp, for limiters with conn and _shared."""
+
+    def _create_pause_table(self, conn):
+        conn.execute('CREATE TABLE IF NOT EXISTS pauses (name TEXT PRIMARY KEY, until REAL)')
+
+    def _paused_until(self, conn):
+        if conn is None:
+            return self._local_paused_until
+        row = conn.execute('SELECT until FROM pauses WHERE name = ?', (self.name,)).fetchone()
+        return row['until'] if row else 0.0
+
+    def pause(self, seconds):
+        """Hold back every caller of this limiter for at least seconds from now."""
+        until = time.time() + seconds
+        if self._shared:
+            try:
+                # A pause can only be extended, never cut short by a later one
+                self.conn.execute(
+                    'INSERT INTO pauses (name, until) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET until = MAX(until, excluded.until)',
+                    (self.name, until)
+                )
+                return until
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Rate limiter {self.name} falling back to a per-process pause: {e}")
+                self._shared = False
+        with self._local_lock:
+            self._local_paused_until = max(self._local_paused_until, until)
+        return until
+
+
+class TokenBucket(_Pausable):
+    """Cross-process token bucket: rate tokens per second, up to burst."""
+
+    def __init__(self, name, rate, burst=1, db_name='rate_limits'):
+        self.name = name
+        self.defaults = {'rate': rate, 'burst': burst}
+        self.db_name = db_name
+        self.rate = None
+        self.burst = None
+        self._ready = set()
+        self._local_lock = threading.Lock()
+        self._local_state = None
+        self._local_paused_until = 0.0
+        self._shared = True
+
+    def _configure(self):
+        # Settings are read here rather than at import time so values loaded
+        # from .env after this module is imported are still honoured
+        if self.rate is None:
+            prefix = f"RATE_LIMIT_{self.name.upper()}"
+            self.rate = _env_float(prefix, self.defaults['rate'])
+            self.burst = max(1.0, _env_float(prefix + '_BURST', self.defaults['burst']))
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)'
+            )
+            self._create_pause_table(conn)
+            self._ready.add(id(conn))
+        return conn
+
+    def _take(self, state, tokens, now):
+        available, updated_at = state if state else (self.burst, now)
+        available = min(self.burst, available + (now - updated_at) * self.rate)
+        # Going negative reserves a slot in the queue of waiting callers
+        available -= tokens
+        wait = -available / self.rate if available < 0 else 0.0
+        return (available, now), wait
+
+    def reserve(self, tokens=1):
+        """Take tokens now and return how long the caller must wait to use them."""
+        self._configure()
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.time()
+        if self._shared:
+            try:
+                conn = self.conn
+                with transaction(conn):
+                    row = conn.execute(
+                        'SELECT tokens, updated_at FROM buckets WHERE name = ?', (self.name,)
+                    ).fetchone()
+                    state, wait = self._take((row['tokens'], row['updated_at']) if row else None, tokens, now)
+                    conn.execute(
+                        'INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                        (self.name, state[0], state[1])
+                    )
+                    paused_until = self._paused_until(conn)
+                return max(wait, paused_until - now)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Rate limiter {self.name} falling back to per-process pacing: {e}")
+                self._shared = False
+
+        with self._local_lock:
+            self._local_state, wait = self._take(self._local_state, tokens, now)
+            paused_until = self._paused_until(None)
+        return max(wait, paused_until - now)
+
+    def acquire(self, tokens=1):
+        """Wait until tokens are available; returns the seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            if wait > 5:
+                logger.info(f"Rate limiter {self.name}: waiting {wait:.1f}s")
+            time.sleep(wait)
+        return wait
+
+
+class RateLimitExceeded(Exception):
+    """The next free slot is further away than the caller is willing to wait."""
+
+    def __init__(self, name, wait):
+        super().__init__(f"Rate limit {name} exhausted, next slot in {wait:.0f}s")
+        self.name = name
+        self.wait = wait
+
+
+class SlidingWindowLimiter(_Pausable):
+    """Cross-process sliding-window limiter over minute, hour and day tiers.
+
+    Every call is logged with its timestamp. A reservation picks the earliest
+    moment at which one more call fits every window and logs the call at that
+    moment, so later callers queue behind it. The caller then sleeps outside
+    the transaction. Reservations further away than max_wait raise
+    RateLimitExceeded instead, e.g. once the daily quota is spent. Because the
+    log lives in SQLite, daily counts survive restarts.
+
+    Limits can be overridden with RATE_LIMIT_<NAME>_PER_MINUTE, _PER_HOUR and
+    _PER_DAY, and the longest acceptable wait with RATE_LIMIT_MAX_WAIT.
+    """
+
+    WINDOWS = (('minute', 60), ('hour', 3600), ('day', 86400))
+
+    def __init__(self, name, per_minute=None, per_hour=None, per_day=None, max_wait=None,
+                 db_name='rate_limits'):
+        self.name = name
+        self.defaults = {'minute': per_minute, 'hour': per_hour, 'day': per_day, 'max_wait': max_wait}
+        self.db_name = db_name
+        self.limits = None
+        self.max_wait = None
+        self._ready = set()
+        self._local_lock = threading.Lock()
+        self._local_calls = []
+        self._local_paused_until = 0.0
+        self._shared = True
+
+    def _configure(self):
+        if self.limits is None:
+            prefix = f"RATE_LIMIT_{self.name.upper()}_PER_"
+            limits = []
+            for tier, seconds in self.WINDOWS:
+                limit = _env_float(prefix + tier.upper(), self.defaults[tier] or 0)
+                if limit > 0:
+                    limits.append((tier, seconds, int(limit)))
+            self.max_wait = _env_float('RATE_LIMIT_MAX_WAIT', self.defaults['max_wait'] or 600)
+            self.limits = limits
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute('CREATE TABLE IF NOT EXISTS window_calls (name TEXT NOT NULL, ts REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS window_calls_name_ts ON window_calls (name, ts)')
+            self._create_pause_table(conn)
+            self._ready.add(id(conn))
+        return conn
+
+    def _earliest_slot(self, count_since, nth_since, start):
+        # Move the slot forward until one more call fits every window; each
+        # move can only push other windows' constraints later, so this settles
+        # after a few passes
+        slot = start
+        for _ in range(10):
+            moved = False
+            for _tier, seconds, limit in self.limits:
+                used = count_since(slot - seconds)
+                if used >= limit:
+                    # The oldest (used - limit + 1) calls must leave the window
+                    candidate = nth_since(slot - seconds, used - limit) + seconds
+                    if candidate > slot:
+                        slot = candidate
+                        moved = True
+            if not moved:
+                break
+        return slot
+
+    def reserve(self):
+        """Log one call at the earliest free slot and return the wait until it."""
+        self._configure()
+        if not self.limits:
+            return 0.0
+
+        now = time.time()
+        longest = max(seconds for _tier, seconds, _limit in self.limits)
+
+        if self._shared:
+            try:
+                conn = self.conn
+                with transaction(conn):
+                    conn.execute('DELETE FROM window_calls WHERE name = ? AND ts <= ?', (self.name, now - longest))
+
+                    def count_since(start):
+                        return conn.execute(
+                            'SELECT COUNT(*) FROM window_calls WHERE name = ? AND ts > ?', (self.name, start)
+                        ).fetchone()[0]
+
+                    def nth_since(start, offset):
+                        return conn.execute(
+                            'SELECT ts FROM window_calls WHERE name = ? AND ts > ? ORDER BY ts LIMIT 1 OFFSET ?',
+                            (self.name, start, offset)
+                        ).fetchone()[0]
+
+                    start = max(now, self._paused_until(conn))
+                    slot = self._earliest_slot(count_since, nth_since, start)
+                    if slot - now > self.max_wait:
+                        raise RateLimitExceeded(self.name, slot - now)
+                    conn.execute('INSERT INTO window_calls (name, ts) VALUES (?, ?)', (self.name, slot))
+                return slot - now
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Rate limiter {self.name} falling back to per-process limits: {e}")
+                self._shared = False
+
+        with self._local_lock:
+            self._local_calls = [ts for ts in self._local_calls if ts > now - longest]
+            calls = self._local_calls
+
+            def count_since(start):
+                return sum(1 for ts in calls if ts > start)
+
+            def nth_since(start, offset):
+                return sorted(ts for ts in calls if ts > start)[offset]
+
+            start = max(now, self._paused_until(None))
+            slot = self._earliest_slot(count_since, nth_since, start)
+            if slot - now > self.max_wait:
+                raise RateLimitExceeded(self.name, slot - now)
+            calls.append(slot)
+        return slot - now
+
+    def acquire(self):
+        """Wait for a free slot; returns the seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            logger.info(f"Rate limiter {self.name}: waiting {wait:.1f}s")
+            time.sleep(wait)
+        return wait
+
+    def usage(self):
+        """Calls made in each window and the configured limits."""
+        self._configure()
+        now = time.time()
+        result = {}
+        for tier, seconds, limit in self.limits:
+            try:
+                used = self.conn.execute(
+                    'SELECT COUNT(*) FROM window_calls WHERE name = ? AND ts > ? AND ts <= ?',
+                    (self.name, now - seconds, now)
+                ).fetchone()[0] if self._shared else sum(
+                    1 for ts in self._local_calls if now - seconds < ts <= now
+                )
+            except (sqlite3.Error, OSError):
+                used = None
+            result[tier] = {'used': used, 'limit': limit}
+        return result
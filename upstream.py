@@ -0,0 +1,363 @@
+"""
+Shared HTTP client layer for upstream APIs (Zoho CRM, Zoho OAuth, Apollo.io).
+
+Each upstream gets its own requests.Session with a keep-alive connection pool,
+so consecutive calls to the same host reuse the TCP+TLS connection instead of
+opening a new one per request. Pool sizes and timeouts are configurable per
+upstream through environment variables:
+
+    UPSTREAM_<NAME>_POOL_CONNECTIONS   number of per-host pools to cache
+    UPSTREAM_<NAME>_POOL_MAXSIZE       connections kept alive per host
+    UPSTREAM_<NAME>_MAX_RETRIES        retries on connection errors
+    UPSTREAM_<NAME>_TIMEOUT            default request timeout in seconds
+
+where <NAME> is ZOHO_CRM, ZOHO_ACCOUNTS or APOLLO.
+
+Every request first takes a token from the upstream's shared rate limiter
+(see rate_limit.py), so callers only wait when the upstream's budget is
+actually exhausted.
+
+Responses adjust that pacing:
+
+- quota headers (Zoho's X-RATELIMIT-*, Apollo's x-*-requests-left) are read
+  on every response; once the remaining share of a window drops below
+  UPSTREAM_<NAME>_LOW_WATERMARK (default 0.1), the limiter is paused between
+  calls so the rest of the quota is spread until the window resets;
+- 429 and 503 responses pause the limiter for every worker, for Retry-After
+  seconds when given, and are retried;
+- other 5xx responses are retried by the caller only, and only for
+  idempotent methods unless the client is marked retry_unsafe.
+
+Retries back off exponentially with jitter, UPSTREAM_<NAME>_BACKOFF_BASE
+seconds doubling up to UPSTREAM_<NAME>_BACKOFF_MAX, for at most
+UPSTREAM_<NAME>_RETRY_ATTEMPTS retries. When they run out the last response
+is returned as is; callers can check is_throttled() and raise
+UpstreamThrottled, and raise UpstreamError for any other failed answer,
+rather than treat it as empty data.
+
+A client given an auth token manager (see zoho_auth.py) also recovers from
+a rejected OAuth token: a 401 INVALID_TOKEN invalidates the token in the
+Authorization header and the call is repeated once with a fresh one, so a
+token that expired in the middle of a long job does not fail the rest of it.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import RateLimitExceeded, SlidingWindowLimiter, TokenBucket
+
+logger = logging.getLogger('job_scraper.upstream')
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def zoho_domain():
+    """Base URL of the Zoho APIs, from ZOHO_DOMAIN.
+
+    Read on every call rather than at import, so a value loaded from .env
+    after the modules are imported (e.g. the offline bulk stub) applies.
+    """
+    return os.environ.get('ZOHO_DOMAIN', 'https://www.zohoapis.com').rstrip('/')
+
+
+# Statuses worth retrying, and those that mean the whole upstream wants a break
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# (limit header, remaining header, window in seconds); Zoho sends the reset time
+# in X-RATELIMIT-RESET instead of a fixed window
+QUOTA_HEADERS = (
+    ('X-RATELIMIT-LIMIT', 'X-RATELIMIT-REMAINING', None),
+    ('x-rate-limit-minute', 'x-minute-requests-left', 60),
+    ('x-rate-limit-hourly', 'x-hourly-requests-left', 3600),
+    ('x-rate-limit-24-hour', 'x-24-hour-requests-left', 86400)
+)
+
+
+class UpstreamThrottled(RateLimitExceeded):
+    """The upstream kept refusing calls for rate limiting after every retry."""
+
+
+class UpstreamError(Exception):
+    """The upstream failed to answer: an error status or a network failure."""
+
+    def __init__(self, name, detail):
+        super().__init__(f"{name} request failed: {detail}")
+        self.name = name
+        self.detail = detail
+
+
+def _header_number(response, name):
+    try:
+        return float(response.headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retry_after(response, default=None):
+    """Seconds to wait according to a response's Retry-After header."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def seconds_until_reset(response):
+    """Seconds until the quota in X-RATELIMIT-RESET resets, if sent."""
+    reset = _header_number(response, 'X-RATELIMIT-RESET')
+    if reset is None:
+        return None
+    # Zoho sends an epoch timestamp in milliseconds; accept seconds or a delta too
+    if reset > 1e12:
+        reset /= 1000
+    if reset > 1e9:
+        reset -= time.time()
+    return max(0.0, reset)
+
+
+def is_throttled(response):
+    return response.status_code in THROTTLE_STATUSES
+
+
+def token_rejected(response):
+    """Whether a response refused the call's OAuth token."""
+    if response.status_code != 401:
+        return False
+    try:
+        code = response.json().get('code')
+    except (ValueError, AttributeError):
+        return True
+    # Other 401s, e.g. OAUTH_SCOPE_MISMATCH, are not fixed by a new token
+    return code in (None, 'INVALID_TOKEN', 'AUTHENTICATION_FAILURE')
+
+
+class UpstreamClient:
+    """Pooled HTTP client for a single upstream API.
+
+    Exposes the same get/post/put/delete/request interface as the requests
+    module so helpers can switch over without changing their call sites.
+    Sessions are created lazily per process, which keeps them fork-safe under
+    gunicorn's pre-forked workers.
+
+    limiter paces every request; routes is a list of (url fragment, limiter)
+    pairs for endpoints that have a budget of their own. retry_unsafe allows
+    retrying POSTs on 5xx, for upstreams whose POSTs only read. auth is an
+    object with get_token() and invalidate(token), used to replace a token
+    the upstream rejects.
+    """
+
+    def __init__(self, name, pool_connections=2, pool_maxsize=10, max_retries=2, timeout=60,
+                 limiter=None, routes=(), retry_attempts=3, backoff_base=1.0, backoff_max=60.0,
+                 low_watermark=0.1, retry_unsafe=False, auth=None):
+        self.name = name
+        self.limiter = limiter
+        self.auth = auth
+        self.routes = list(routes)
+        self.retry_unsafe = retry_unsafe
+        self.defaults = {
+            'pool_connections': pool_connections,
+            'pool_maxsize': pool_maxsize,
+            'max_retries': max_retries,
+            'timeout': timeout,
+            'retry_attempts': retry_attempts,
+            'backoff_base': backoff_base,
+            'backoff_max': backoff_max,
+            'low_watermark': low_watermark
+        }
+        self.timeout = timeout
+        self.retry_attempts = retry_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.low_watermark = low_watermark
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _build_session(self):
+        # Settings are read here rather than at import time so values loaded
+        # from .env after this module is imported are still honoured
+        prefix = f"UPSTREAM_{self.name.upper()}_"
+        pool_maxsize = _env_int(prefix + 'POOL_MAXSIZE', self.defaults['pool_maxsize'])
+        self.timeout = _env_float(prefix + 'TIMEOUT', self.defaults['timeout'])
+        self.retry_attempts = _env_int(prefix + 'RETRY_ATTEMPTS', self.defaults['retry_attempts'])
+        self.backoff_base = _env_float(prefix + 'BACKOFF_BASE', self.defaults['backoff_base'])
+        self.backoff_max = _env_float(prefix + 'BACKOFF_MAX', self.defaults['backoff_max'])
+        self.low_watermark = _env_float(prefix + 'LOW_WATERMARK', self.defaults['low_watermark'])
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=_env_int(prefix + 'POOL_CONNECTIONS', self.defaults['pool_connections']),
+            pool_maxsize=pool_maxsize,
+            max_retries=_env_int(prefix + 'MAX_RETRIES', self.defaults['max_retries'])
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        logger.info(
+            f"Created {self.name} session (pool_maxsize={pool_maxsize}, "
+            f"timeout={self.timeout}s)"
+        )
+        return session
+
+    def limiter_for(self, url):
+        for fragment, limiter in self.routes:
+            if fragment in url:
+                return limiter
+        return self.limiter
+
+    def _backoff(self, attempt):
+        # Full jitter keeps workers that failed together from retrying together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _pace(self, response, limiter):
+        """Slow the limiter down when the response says the quota is running out."""
+        if limiter is None:
+            return
+        delay = 0.0
+        for limit_header, remaining_header, window in QUOTA_HEADERS:
+            limit = _header_number(response, limit_header)
+            remaining = _header_number(response, remaining_header)
+            if not limit or remaining is None or remaining / limit >= self.low_watermark:
+                continue
+            reset = seconds_until_reset(response) if window is None else window
+            if reset is None:
+                continue
+            # Spread what is left evenly until the window resets
+            delay = max(delay, reset if remaining <= 0 else reset / remaining)
+        if delay > 0:
+            logger.info(f"{self.name} quota running low, spacing calls {delay:.1f}s apart")
+            limiter.pause(delay)
+
+    def request(self, method, url, **kwargs):
+        session = self.session
+        limiter = self.limiter_for(url)
+        kwargs.setdefault('timeout', self.timeout)
+        if method.upper() in IDEMPOTENT_METHODS or self.retry_unsafe:
+            retry_statuses = RETRY_STATUSES
+        else:
+            # A refused call was never applied, so only 429 is safe to repeat
+            retry_statuses = (429,)
+
+        attempt = 0
+        reauthorized = False
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            response = session.request(method, url, **kwargs)
+            self._pace(response, limiter)
+            if not reauthorized and token_rejected(response) and self._reauthorize(kwargs):
+                # A rejected token was never applied, so any method can be repeated
+                reauthorized = True
+                response.close()
+                continue
+            if response.status_code not in retry_statuses:
+                return response
+
+            delay = retry_after(response) if response.status_code in THROTTLE_STATUSES else None
+            if delay is None:
+                delay = self._backoff(attempt)
+            shared_pause = response.status_code in THROTTLE_STATUSES and limiter is not None
+            if shared_pause:
+                # Every worker holds off, not just this one; acquire() waits it out
+                limiter.pause(delay)
+            if attempt >= self.retry_attempts:
+                return response
+
+            logger.warning(
+                f"{self.name} answered {response.status_code} for {method} {url}, "
+                f"retry {attempt + 1}/{self.retry_attempts} in {delay:.1f}s"
+            )
+            response.close()
+            if not shared_pause:
+                time.sleep(delay)
+            attempt += 1
+
+    def _reauthorize(self, kwargs):
+        """Swap the rejected token in kwargs for a fresh one; False if there is none."""
+        headers = kwargs.get('headers') or {}
+        scheme, _, token = headers.get('Authorization', '').partition(' ')
+        if self.auth is None or not token:
+            return False
+        self.auth.invalidate(token)
+        try:
+            fresh = self.auth.get_token()
+        except Exception as e:
+            logger.warning(f"{self.name} rejected the access token and no new one could be obtained: {e}")
+            return False
+        if fresh == token:
+            return False
+        logger.info(f"{self.name} rejected the access token, retrying with a fresh one")
+        # The caller's headers may be shared with other calls; leave them alone
+        kwargs['headers'] = dict(headers, Authorization=f"{scheme} {fresh}")
+        return True
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._pid = None
+
+
+# Shared clients - one connection pool per upstream host, each paced by a
+# rate limiter shared with the other workers
+zoho_crm = UpstreamClient(
+    'zoho_crm', pool_maxsize=20,
+    limiter=TokenBucket('zoho_crm', rate=5, burst=10)
+)
+zoho_accounts = UpstreamClient(
+    'zoho_accounts', pool_connections=1, pool_maxsize=2,
+    limiter=TokenBucket('zoho_accounts', rate=1 / 60, burst=5)
+)
+apollo = UpstreamClient(
+    'apollo', pool_maxsize=10, retry_unsafe=True,
+    limiter=SlidingWindowLimiter('apollo_search', per_minute=200, per_hour=400, per_day=2000),
+    routes=[('/organizations/', SlidingWindowLimiter('apollo_enrich', per_minute=200, per_hour=400, per_day=2000))]
+)
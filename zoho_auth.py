@@ -0,0 +1,209 @@
+"""
+Zoho OAuth access token manager.
+
+Access tokens are cached until shortly before they expire and shared between
+gunicorn workers through a small JSON file, so the rate-limited token
+endpoint is only hit about once an hour instead of on every request.
+Refreshes are single-flight: a thread lock serialises threads within a worker
+and an exclusive file lock serialises workers, and whoever gets the lock
+second simply picks up the token the first one wrote.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from local_store import data_path
+from upstream import zoho_accounts
+
+logger = logging.getLogger('job_scraper.zoho_auth')
+
+ZOHO_TOKEN_URL = "https://accounts.zoho.com/oauth/v2/token"
+DEFAULT_EXPIRES_IN = 3600
+
+
+class ZohoTokenManager:
+    """Caches Zoho access tokens in memory and in a file shared by workers."""
+
+    def __init__(self, client_id, client_secret, refresh_token, cache_path=None,
+                 refresh_margin=None, token_url=ZOHO_TOKEN_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin if refresh_margin is not None else int(
+            os.environ.get('ZOHO_TOKEN_REFRESH_MARGIN', 300)
+        )
+        self.cache_path = cache_path or os.environ.get('ZOHO_TOKEN_CACHE') or data_path('zoho_token.json')
+        # Tokens for different credentials must never be mixed up
+        self._cache_key = hashlib.sha256(f"{client_id}:{refresh_token}".encode()).hexdigest()[:16]
+        self._access_token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+        self._rejected_token = None
+
+    def get_token(self):
+        """Return a valid access token, refreshing it only when necessary."""
+        self._ensure_background_refresh()
+
+        if self._is_fresh():
+            return self._access_token
+
+        if self._load_cache() and self._is_fresh():
+            return self._access_token
+
+        return self._refresh()
+
+    def invalidate(self, access_token=None):
+        """Drop the cached token, e.g. after Zoho rejected it with a 401."""
+        with self._lock:
+            if access_token is None or access_token == self._access_token:
+                # Remember it so a stale copy in the shared cache is not reused
+                self._rejected_token = self._access_token
+                self._access_token = None
+                self._expires_at = 0
+
+    def _is_fresh(self, margin=None):
+        margin = self.refresh_margin if margin is None else margin
+        return bool(self._access_token) and time.time() < self._expires_at - margin
+
+    def _refresh(self, margin=None):
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._is_fresh(margin):
+                return self._access_token
+
+            with self._file_lock():
+                # ...or another worker, in which case the shared cache has it
+                if self._load_cache() and self._is_fresh(margin):
+                    return self._access_token
+
+                access_token, expires_in = self._request_token()
+                self._access_token = access_token
+                self._expires_at = time.time() + expires_in
+                self._save_cache()
+                return access_token
+
+    def _request_token(self):
+        data = {
+            'refresh_token': self.refresh_token,
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'grant_type': 'refresh_token'
+        }
+
+        logger.info("Requesting Zoho access token")
+        response = zoho_accounts.post(self.token_url, data=data)
+
+        if response.status_code == 200:
+            payload = response.json()
+            if 'access_token' not in payload:
+                error_msg = f"Error getting token: Response: {response.text}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+            logger.info("Access token obtained successfully")
+            return payload['access_token'], int(payload.get('expires_in', DEFAULT_EXPIRES_IN))
+
+        error_msg = f"Error getting token: Code {response.status_code}, Response: {response.text}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+    def _ensure_background_refresh(self):
+        # One refresher thread per process; gunicorn forks after import so the
+        # pid check starts a fresh thread in each worker
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            thread = threading.Thread(target=self._refresh_loop, name='zoho-token-refresher', daemon=True)
+            thread.start()
+
+    def _refresh_loop(self):
+        # Refresh ahead of the request path so callers never wait on Zoho
+        early_margin = self.refresh_margin * 2
+        while True:
+            sleep_for = self._expires_at - early_margin - time.time()
+            if sleep_for > 0:
+                time.sleep(min(sleep_for, 300))
+                continue
+            try:
+                self._refresh(early_margin)
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {e}")
+                time.sleep(60)
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if cached.get('key') != self._cache_key or not cached.get('access_token'):
+            return False
+        if cached['access_token'] == self._rejected_token:
+            return False
+
+        if cached.get('expires_at', 0) > self._expires_at:
+            self._access_token = cached['access_token']
+            self._expires_at = cached['expires_at']
+        return True
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'key': self._cache_key,
+                    'access_token': self._access_token,
+                    'expires_at': self._expires_at
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            # Read-only filesystems still get the in-process cache
+            logger.warning(f"Could not write token cache {self.cache_path}: {e}")
+
+    def _file_lock(self):
+        return _FileLock(f"{self.cache_path}.lock")
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file; a no-op where flock is unavailable."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except OSError as e:
+            logger.warning(f"Could not lock {self.path}: {e}")
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
@@ -0,0 +1,168 @@
+"""
+Full-module exports through the Zoho CRM Bulk Read API.
+
+Paging a module through the records API costs one call per 200 records.
+A Bulk Read job exports up to 200,000 records per page as a zipped CSV
+instead. The flow is to create the job, poll it until it completes, download
+the zip and parse the CSV row by row. The zip is spooled to a temporary file
+and rows are streamed, so memory stays flat whatever the module size.
+
+Cold starts and nightly reconciliation load the exports into the local
+mirror (see zoho_sync.py):
+
+    python zoho_bulk.py                     snapshot Accounts, Contacts and Jobs
+    python zoho_bulk.py Accounts Contacts   snapshot only these modules
+
+To test offline, point ZOHO_DOMAIN at zoho_bulk_stub.py.
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+import zipfile
+
+from upstream import zoho_crm, zoho_domain
+
+logger = logging.getLogger('job_scraper.zoho_bulk')
+
+
+def _bulk_url(path=''):
+    return f"{zoho_domain()}/crm/bulk/v2/read{path}"
+
+
+# Lookup fields in each mirrored module, exported by Bulk Read as bare IDs
+LOOKUP_FIELDS = {
+    'Accounts': (),
+    'Contacts': ('Account_Name',),
+    'Jobs': ('Account',)
+}
+
+
+class BulkReadError(Exception):
+    """A Bulk Read job could not be created, failed or timed out."""
+
+
+def _headers(access_token):
+    return {'Authorization': f'Zoho-oauthtoken {access_token}'}
+
+
+def create_bulk_read(access_token, module, fields, page=1, criteria=None):
+    """Start a Bulk Read job and return its id."""
+    query = {'module': module, 'fields': list(fields), 'page': page}
+    if criteria:
+        query['criteria'] = criteria
+
+    response = zoho_crm.post(
+        _bulk_url(),
+        headers=_headers(access_token),
+        json={'query': query}
+    )
+    if response.status_code not in (200, 201):
+        raise BulkReadError(f"Error creating bulk read for {module}: {response.status_code} - {response.text}")
+
+    job_id = response.json()['data'][0]['details']['id']
+    logger.info(f"Bulk read {job_id} created for {module} (page {page})")
+    return job_id
+
+
+def wait_for_bulk_read(access_token, job_id, poll_interval=None, timeout=None):
+    """Poll a Bulk Read job until it completes and return its result info."""
+    poll_interval = poll_interval if poll_interval is not None else float(
+        os.environ.get('ZOHO_BULK_POLL_INTERVAL', 10)
+    )
+    timeout = timeout if timeout is not None else float(os.environ.get('ZOHO_BULK_TIMEOUT', 1800))
+    deadline = time.time() + timeout
+
+    while True:
+        response = zoho_crm.get(_bulk_url(f"/{job_id}"), headers=_headers(access_token))
+        if response.status_code != 200:
+            raise BulkReadError(f"Error polling bulk read {job_id}: {response.status_code} - {response.text}")
+
+        job = response.json()['data'][0]
+        state = job.get('state')
+        if state == 'COMPLETED':
+            return job.get('result', {})
+        if state == 'FAILURE':
+            raise BulkReadError(f"Bulk read {job_id} failed: {job}")
+        if time.time() > deadline:
+            raise BulkReadError(f"Bulk read {job_id} still {state} after {timeout}s")
+
+        logger.debug(f"Bulk read {job_id} is {state}, waiting {poll_interval}s")
+        time.sleep(poll_interval)
+
+
+def iter_bulk_result(access_token, job_id):
+    """Download a completed job's zip and yield its CSV rows as dicts."""
+    response = zoho_crm.get(
+        _bulk_url(f"/{job_id}/result"),
+        headers=_headers(access_token),
+        stream=True
+    )
+    if response.status_code != 200:
+        raise BulkReadError(f"Error downloading bulk read {job_id}: {response.status_code} - {response.text}")
+
+    with tempfile.TemporaryFile() as spool:
+        for block in response.iter_content(chunk_size=1024 * 1024):
+            spool.write(block)
+        spool.seek(0)
+
+        with zipfile.ZipFile(spool) as archive:
+            for name in archive.namelist():
+                if not name.lower().endswith('.csv'):
+                    continue
+                with archive.open(name) as raw:
+                    reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+                    for row in reader:
+                        # Empty cells are exported as "", the records API returns null
+                        yield {key: (value if value != '' else None) for key, value in row.items()}
+
+
+def export_module(access_token, module, fields, criteria=None):
+    """Yield every record of a module, one Bulk Read page after another."""
+    fields = list(dict.fromkeys(['id', 'Modified_Time'] + list(fields)))
+    page = 1
+    while True:
+        job_id = create_bulk_read(access_token, module, fields, page=page, criteria=criteria)
+        result = wait_for_bulk_read(access_token, job_id)
+        yield from iter_bulk_result(access_token, job_id)
+
+        logger.info(f"Bulk read {job_id}: page {page} of {module} had {result.get('count', 0)} records")
+        if not result.get('more_records'):
+            break
+        page += 1
+
+
+def snapshot_module(access_token, mirror, module):
+    """Replace a module in the local mirror with a full Bulk Read export."""
+    rows = export_module(access_token, module, mirror.modules[module])
+    return mirror.load_snapshot(module, rows, LOOKUP_FIELDS.get(module, ()))
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+    from zoho_auth import ZohoTokenManager
+    from zoho_sync import ZohoMirror
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    mirror = ZohoMirror()
+    modules = sys.argv[1:] or list(mirror.modules)
+    unknown = [module for module in modules if module not in mirror.modules]
+    if unknown:
+        print(f"Módulos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(mirror.modules)})")
+        sys.exit(1)
+
+    tokens = ZohoTokenManager(
+        os.environ.get('ZOHO_CLIENT_ID'),
+        os.environ.get('ZOHO_CLIENT_SECRET'),
+        os.environ.get('ZOHO_REFRESH_TOKEN')
+    )
+    zoho_crm.auth = tokens
+    for module in modules:
+        snapshot_module(tokens.get_token(), mirror, module)
+    print(mirror.stats())
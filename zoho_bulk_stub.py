@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Zoho Bulk Read API, for testing zoho_bulk.py offline.
+
+Serves canned CSV exports as zips through the same endpoints and JSON
+shapes as Zoho. Each job reports IN PROGRESS on its first poll so the
+polling path is exercised too. Data comes from <Module>.csv files in
+--data-dir; modules without a file get --sample generated records.
+
+    python zoho_bulk_stub.py --port 5055 --sample 1000 --page-size 400
+    ZOHO_DOMAIN=http://127.0.0.1:5055 ZOHO_BULK_POLL_INTERVAL=0.5 python zoho_bulk.py
+
+Authorization headers are accepted but not checked.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+settings = {'data_dir': None, 'sample': 100, 'page_size': 200000}
+jobs = {}
+job_ids = itertools.count(554023000000568002)
+
+
+def _sample_rows(module, count):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        modified = (start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        row = {'id': str(4876876000000100000 + i), 'Modified_Time': modified}
+        if module == 'Accounts':
+            row.update({
+                'Account_Name': f'Sample Company {i}',
+                'Website': f'https://sample{i}.example.com' if i % 5 else '',
+                'Apollo_Contact': 'true' if i % 20 == 0 else 'false'
+            })
+        elif module == 'Contacts':
+            # Every third sample account has a contact
+            row.update({
+                'Account_Name': str(4876876000000100000 + i * 3),
+                'Email': f'contact{i}@sample{i * 3}.example.com'
+            })
+        elif module == 'Jobs':
+            row.update({
+                'ID_Indeed': f'sample-job-{i}',
+                'Account': str(4876876000000100000 + i % max(count, 1))
+            })
+        yield row
+
+
+def _module_rows(module, fields):
+    path = os.path.join(settings['data_dir'], f'{module}.csv') if settings['data_dir'] else None
+    if path and os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = list(_sample_rows(module, settings['sample']))
+    return [{field: row.get(field, '') for field in fields} for row in rows]
+
+
+def _zip_csv(job_id, fields, rows):
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows)
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f'{job_id}.csv', text.getvalue())
+    return buffer.getvalue()
+
+
+@app.route('/crm/bulk/v2/read', methods=['POST'])
+def create_job():
+    query = (request.get_json(silent=True) or {}).get('query', {})
+    module = query.get('module')
+    if not module:
+        return jsonify({'code': 'INVALID_DATA', 'message': 'module is required', 'status': 'error'}), 400
+
+    job_id = str(next(job_ids))
+    jobs[job_id] = {
+        'module': module,
+        'fields': query.get('fields') or ['id'],
+        'page': int(query.get('page', 1)),
+        'polls': 0
+    }
+    return jsonify({'data': [{
+        'status': 'success',
+        'code': 'ADDED_SUCCESSFULLY',
+        'message': 'Added successfully.',
+        'details': {'id': job_id, 'operation': 'read', 'state': 'ADDED'}
+    }], 'info': {}}), 201
+
+
+@app.route('/crm/bulk/v2/read/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'code': 'INVALID_URL_PATTERN', 'status': 'error'}), 404
+
+    job['polls'] += 1
+    if job['polls'] == 1:
+        return jsonify({'data': [{'id': job_id, 'operation': 'read', 'state': 'IN PROGRESS'}]})
+
+    rows = _module_rows(job['module'], job['fields'])
+    page_size = settings['page_size']
+    start = (job['page'] - 1) * page_size
+    count = len(rows[start:start + page_size])
+    return jsonify({'data': [{
+        'id': job_id,
+        'operation': 'read',
+        'state': 'COMPLETED',
+        'result': {
+            'page': job['page'],
+            'count': count,
+            'per_page': page_size,
+            'download_url': f'/crm/bulk/v2/read/{job_id}/result',
+            'more_records': start + page_size < len(rows)
+        }
+    }]})
+
+
+@app.route('/crm/bulk/v2/read/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'code': 'INVALID_URL_PATTERN', 'status': 'error'}), 404
+
+    rows = _module_rows(job['module'], job['fields'])
+    start = (job['page'] - 1) * settings['page_size']
+    body = _zip_csv(job_id, job['fields'], rows[start:start + settings['page_size']])
+    return Response(body, mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={job_id}.zip'})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stand-in Zoho Bulk Read API')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--data-dir', help='directory with <Module>.csv files to serve')
+    parser.add_argument('--sample', type=int, default=100, help='generated records per module without a CSV')
+    parser.add_argument('--page-size', type=int, default=200000, help='records per Bulk Read page')
+    args = parser.parse_args()
+
+    settings.update(data_dir=args.data_dir, sample=args.sample, page_size=args.page_size)
+    app.run(host='127.0.0.1', port=args.port)
@@ -0,0 +1,169 @@
+"""
+Batched record writes for Zoho CRM modules.
+
+The Zoho insert, update and upsert APIs accept up to 100 records per call
+and report a result per record, so callers hand over the full list of
+prepared records and get back one result per record, in the same order,
+regardless of how many calls it took. Upserts dedupe on the server, which
+saves the search call that would otherwise precede every insert.
+
+An upsert also overwrites the record it matches, so callers that must leave
+existing records alone look them up first with find_existing, one COQL
+query per 50 values rather than a search per record.
+"""
+
+import logging
+
+from upstream import zoho_crm, zoho_domain
+
+logger = logging.getLogger('job_scraper.zoho_records')
+
+MAX_RECORDS_PER_CALL = 100
+# COQL accepts at most 50 values in an IN clause
+MAX_VALUES_PER_QUERY = 50
+
+
+def chunked(items, size):
+    """Yield successive slices of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _record_result(entry):
+    details = entry.get('details') or {}
+    success = entry.get('status') == 'success' or entry.get('code') == 'SUCCESS'
+    return {
+        'success': success,
+        'id': details.get('id') if success else None,
+        'action': entry.get('action', 'insert') if success else None,
+        'code': entry.get('code'),
+        'message': entry.get('message'),
+        'details': details
+    }
+
+
+def _failed_result(code, message):
+    return {
+        'success': False,
+        'id': None,
+        'action': None,
+        'code': code,
+        'message': message,
+        'details': {}
+    }
+
+
+def insert_records(access_token, module, records, trigger=None):
+    """Insert records into a module, 100 per call.
+
+    Returns a list with one result dict per input record:
+    {'success', 'id', 'action', 'code', 'message', 'details'}.
+    """
+    return _write_records(access_token, f"{zoho_domain()}/crm/v2/{module}", records, trigger=trigger)
+
+
+def upsert_records(access_token, module, records, duplicate_check_fields, trigger=None):
+    """Upsert records, letting Zoho dedupe on duplicate_check_fields.
+
+    Same result format as insert_records, with 'action' set to 'insert' or
+    'update' for each record that succeeded.
+    """
+    return _write_records(
+        access_token,
+        f"{zoho_domain()}/crm/v2/{module}/upsert",
+        records,
+        trigger=trigger,
+        extra={'duplicate_check_fields': list(duplicate_check_fields)}
+    )
+
+
+def update_records(access_token, module, records, trigger=None):
+    """Update existing records, each carrying its 'id', 100 per call.
+
+    Same result format as insert_records.
+    """
+    return _write_records(
+        access_token, f"{zoho_domain()}/crm/v2/{module}", records, trigger=trigger, method='PUT'
+    )
+
+
+def _write_records(access_token, url, records, trigger=None, extra=None, method='POST'):
+    headers = {
+        'Authorization': f'Zoho-oauthtoken {access_token}',
+        'Content-Type': 'application/json'
+    }
+
+    results = []
+    for chunk in chunked(records, MAX_RECORDS_PER_CALL):
+        body = {'data': chunk}
+        if trigger is not None:
+            body['trigger'] = trigger
+        if extra:
+            body.update(extra)
+
+        try:
+            response = zoho_crm.request(method, url, headers=headers, json=body)
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+        except Exception as e:
+            logger.error(f"Error writing batch to {url}: {e}")
+            results.extend(_failed_result('REQUEST_FAILED', str(e)) for _ in chunk)
+            continue
+
+        entries = payload.get('data') if isinstance(payload, dict) else None
+        if isinstance(entries, list) and len(entries) == len(chunk):
+            chunk_results = [_record_result(entry) for entry in entries]
+        else:
+            # The whole call was rejected (auth, malformed body, ...)
+            code = payload.get('code') if isinstance(payload, dict) else None
+            message = payload.get('message') if isinstance(payload, dict) else None
+            logger.error(f"Batch write to {url} failed: {response.status_code} - {response.text}")
+            chunk_results = [
+                _failed_result(code or f"HTTP_{response.status_code}", message or response.text)
+                for _ in chunk
+            ]
+
+        succeeded = sum(1 for r in chunk_results if r['success'])
+        logger.info(f"Batch write to {url}: {succeeded}/{len(chunk)} records succeeded")
+        results.extend(chunk_results)
+
+    return results
+
+
+def find_existing(access_token, module, field, values):
+    """IDs of the records in module whose field matches one of values.
+
+    Returns {value: record id} with values lower-cased, so emails match
+    whatever their case. Raises if Zoho cannot be queried, letting callers
+    fall back to searching record by record.
+    """
+    url = f"{zoho_domain()}/crm/v2/coql"
+    headers = {
+        'Authorization': f'Zoho-oauthtoken {access_token}',
+        'Content-Type': 'application/json'
+    }
+
+    existing = {}
+    values = list(dict.fromkeys(str(value) for value in values if value))
+    for group in chunked(values, MAX_VALUES_PER_QUERY):
+        quoted = ', '.join("'" + value.replace("'", "\\'") + "'" for value in group)
+        offset = 0
+        while True:
+            query = f"select {field} from {module} where {field} in ({quoted}) limit {offset}, 200"
+            response = zoho_crm.post(url, headers=headers, json={'select_query': query})
+            if response.status_code == 204:
+                break
+            if response.status_code != 200:
+                raise Exception(f"COQL query failed: {response.status_code} - {response.text}")
+
+            payload = response.json()
+            for record in payload.get('data', []):
+                if record.get(field):
+                    existing[str(record[field]).lower()] = record['id']
+            if not payload.get('info', {}).get('more_records', False):
+                break
+            offset += 200
+
+    return existing
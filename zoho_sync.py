@@ -0,0 +1,296 @@
+"""
+Incremental local mirror of Zoho CRM modules.
+
+Reports such as "companies without contacts" used to re-read whole modules on
+every call. The mirror keeps a copy of selected fields of each module in
+SQLite and only fetches what changed since the last sync:
+
+- changed records are listed with the If-Modified-Since header set to the
+  newest Modified_Time already mirrored (the module's high-water mark), so
+  after the first full load a sync reads a few pages at most;
+- deletions are reconciled separately from the module's deleted-records
+  list, with its own high-water mark.
+
+Both marks are Zoho timestamps, so local clock skew never drops a change.
+Syncs are idempotent: records modified exactly at the mark are fetched again
+and simply overwritten, and two workers syncing at once only duplicate work.
+
+    python zoho_sync.py            sync every module
+    python zoho_sync.py --stats    show mirrored counts and marks
+"""
+
+import json
+import logging
+import os
+import time
+
+from local_store import connect, transaction
+from upstream import zoho_crm, zoho_domain
+
+logger = logging.getLogger('job_scraper.zoho_sync')
+
+# Modules mirrored by default and the fields kept for each
+DEFAULT_MODULES = {
+    'Accounts': ['Account_Name', 'Website', 'Apollo_Contact'],
+    'Contacts': ['Account_Name', 'Email'],
+    'Jobs': ['ID_Indeed', 'Account']
+}
+
+
+class ZohoMirror:
+    """Local copy of Zoho modules kept current by incremental syncs."""
+
+    def __init__(self, modules=None, db_name='zoho_mirror', max_age=None):
+        self.modules = modules or DEFAULT_MODULES
+        self.db_name = db_name
+        self.max_age = max_age if max_age is not None else int(os.environ.get('ZOHO_SYNC_INTERVAL', 300))
+        self._ready = set()
+
+    @property
+    def conn(self):
+        conn = connect(self.db_name)
+        if id(conn) not in self._ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                'module TEXT NOT NULL, id TEXT NOT NULL, modified_time TEXT, data TEXT NOT NULL, '
+                'PRIMARY KEY (module, id))'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)')
+            self._ready.add(id(conn))
+        return conn
+
+    def _state(self, key):
+        row = self.conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_state(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, value))
+
+    def sync(self, access_token, module):
+        """Bring one module up to date; returns (changed, deleted) counts."""
+        changed = self._sync_changes(access_token, module)
+        deleted = self._sync_deletions(access_token, module)
+        conn = self.conn
+        self._set_state(conn, f'synced_at:{module}', str(time.time()))
+        logger.info(f"Synced {module}: {changed} changed, {deleted} deleted")
+        return changed, deleted
+
+    def sync_all(self, access_token):
+        return {module: self.sync(access_token, module) for module in self.modules}
+
+    def sync_if_stale(self, access_token, max_age=None):
+        """Sync every module not synced within the last max_age seconds."""
+        max_age = self.max_age if max_age is None else max_age
+        for module in self.modules:
+            synced_at = self._state(f'synced_at:{module}')
+            if synced_at is None or time.time() - float(synced_at) > max_age:
+                self.sync(access_token, module)
+
+    def _sync_changes(self, access_token, module):
+        url = f"{zoho_domain()}/crm/v2/{module}"
+        high_water = self._state(f'modified:{module}')
+        headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
+        if high_water:
+            headers['If-Modified-Since'] = high_water
+
+        fields = ','.join(['id', 'Modified_Time'] + list(self.modules[module]))
+        page = 1
+        changed = 0
+
+        while True:
+            params = {
+                'page': page,
+                'per_page': 200,
+                'fields': fields,
+                'sort_by': 'Modified_Time',
+                'sort_order': 'asc'
+            }
+            response = zoho_crm.get(url, headers=headers, params=params)
+            if response.status_code in (204, 304):
+                break
+            if response.status_code != 200:
+                raise Exception(f"Error syncing {module}: {response.status_code} - {response.text}")
+
+            data = response.json()
+            records = data.get('data', [])
+            if records:
+                conn = self.conn
+                with transaction(conn):
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO records (module, id, modified_time, data) VALUES (?, ?, ?, ?)',
+                        [(module, r['id'], r.get('Modified_Time'), json.dumps(r)) for r in records]
+                    )
+                    # Pages are sorted by Modified_Time, so the last record is the newest
+                    newest = records[-1].get('Modified_Time')
+                    if newest:
+                        self._set_state(conn, f'modified:{module}', newest)
+                changed += len(records)
+
+            if not data.get('info', {}).get('more_records', False):
+                break
+            page += 1
+
+        return changed
+
+    def _sync_deletions(self, access_token, module):
+        url = f"{zoho_domain()}/crm/v2/{module}/deleted"
+        high_water = self._state(f'deleted:{module}')
+        if high_water is None and self._state(f'synced_at:{module}') is None:
+            # First sync: the full load already excludes deleted records, so
+            # only deletions after the newest record loaded matter from now on
+            loaded_until = self._state(f'modified:{module}')
+            if loaded_until:
+                self._set_state(self.conn, f'deleted:{module}', loaded_until)
+            return 0
+
+        headers = {'Authorization': f'Zoho-oauthtoken {access_token}'}
+        if high_water:
+            headers['If-Modified-Since'] = high_water
+
+        page = 1
+        deleted = 0
+        newest = high_water
+
+        while True:
+            params = {'type': 'all', 'page': page, 'per_page': 200}
+            response = zoho_crm.get(url, headers=headers, params=params)
+            if response.status_code in (204, 304):
+                break
+            if response.status_code != 200:
+                raise Exception(f"Error syncing deletions for {module}: {response.status_code} - {response.text}")
+
+            data = response.json()
+            records = data.get('data', [])
+            if records:
+                conn = self.conn
+                with transaction(conn):
+                    conn.executemany(
+                        'DELETE FROM records WHERE module = ? AND id = ?',
+                        [(module, r['id']) for r in records]
+                    )
+                deleted += len(records)
+                newest = max([newest or ''] + [r.get('deleted_time') or '' for r in records]) or None
+
+            if not data.get('info', {}).get('more_records', False):
+                break
+            page += 1
+
+        if newest:
+            self._set_state(self.conn, f'deleted:{module}', newest)
+        return deleted
+
+    def load_snapshot(self, module, records, lookup_fields=()):
+        """Replace a module with a full export, e.g. from zoho_bulk.
+
+        Records are staged and swapped in within one transaction, so readers
+        see either the old copy or the new one. Lookup fields exported as bare
+        IDs are stored as {'id': ...} like the records API returns them. Both
+        high-water marks restart from the newest Modified_Time in the export.
+        """
+        staging = f'{module}@snapshot'
+        conn = self.conn
+        conn.execute('DELETE FROM records WHERE module = ?', (staging,))
+
+        total = 0
+        newest = None
+        batch = []
+        for record in records:
+            for field in lookup_fields:
+                value = record.get(field)
+                if value and not isinstance(value, dict):
+                    record[field] = {'id': str(value)}
+            modified = record.get('Modified_Time')
+            if modified and (newest is None or modified > newest):
+                newest = modified
+            batch.append((staging, str(record['id']), modified, json.dumps(record)))
+            if len(batch) >= 1000:
+                with transaction(conn):
+                    conn.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)', batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            with transaction(conn):
+                conn.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)', batch)
+            total += len(batch)
+
+        with transaction(conn):
+            conn.execute('DELETE FROM records WHERE module = ?', (module,))
+            conn.execute('UPDATE records SET module = ? WHERE module = ?', (module, staging))
+            if newest:
+                self._set_state(conn, f'modified:{module}', newest)
+                self._set_state(conn, f'deleted:{module}', newest)
+            self._set_state(conn, f'synced_at:{module}', str(time.time()))
+
+        logger.info(f"Loaded {total} {module} records from snapshot")
+        return total
+
+    def record_change(self, module, record_id, fields):
+        """Apply a write just made to Zoho to the mirrored record.
+
+        Fields are merged into the record, which is added if it is not
+        mirrored yet, so reads see the write before the next sync; that sync
+        then overwrites the record with what Zoho holds.
+        """
+        conn = self.conn
+        with transaction(conn):
+            row = conn.execute(
+                'SELECT modified_time, data FROM records WHERE module = ? AND id = ?',
+                (module, str(record_id))
+            ).fetchone()
+            data = json.loads(row['data']) if row else {'id': str(record_id)}
+            data.update(fields)
+            conn.execute(
+                'INSERT OR REPLACE INTO records (module, id, modified_time, data) VALUES (?, ?, ?, ?)',
+                (module, str(record_id), row['modified_time'] if row else None, json.dumps(data))
+            )
+
+    def records(self, module, limit=None):
+        """Mirrored records of a module as dicts, in Zoho id order."""
+        query = 'SELECT data FROM records WHERE module = ? ORDER BY CAST(id AS INTEGER)'
+        params = [module]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        return [json.loads(row['data']) for row in self.conn.execute(query, params)]
+
+    def related_counts(self, module, lookup_field):
+        """Number of records in module per ID of the record they look up."""
+        rows = self.conn.execute(
+            f"SELECT json_extract(data, '$.{lookup_field}.id') AS parent_id, COUNT(*) AS total "
+            "FROM records WHERE module = ? AND parent_id IS NOT NULL GROUP BY parent_id",
+            (module,)
+        )
+        return {str(row['parent_id']): row['total'] for row in rows}
+
+    def stats(self):
+        conn = self.conn
+        counts = dict(conn.execute('SELECT module, COUNT(*) FROM records GROUP BY module').fetchall())
+        return {
+            module: {
+                'records': counts.get(module, 0),
+                'modified_since': self._state(f'modified:{module}'),
+                'deleted_since': self._state(f'deleted:{module}'),
+                'synced_at': self._state(f'synced_at:{module}')
+            }
+            for module in self.modules
+        }
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+    from zoho_auth import ZohoTokenManager
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    mirror = ZohoMirror()
+    if '--stats' not in sys.argv[1:]:
+        tokens = ZohoTokenManager(
+            os.environ.get('ZOHO_CLIENT_ID'),
+            os.environ.get('ZOHO_CLIENT_SECRET'),
+            os.environ.get('ZOHO_REFRESH_TOKEN')
+        )
+        zoho_crm.auth = tokens
+        mirror.sync_all(tokens.get_token())
+    print(json.dumps(mirror.stats(), indent=2))